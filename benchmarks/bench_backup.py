@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Time each backup strategy on a synthetic Windsurf installation.
+
+Extracts a synthetic Windsurf-shaped tarball, then backs it up with every
+snapshot strategy (reflink, hardlink, full copy) and reports the wall time
+and the number of file data bytes written by each. Strategies that the
+filesystem does not support are reported as unavailable.
+
+Usage: python benchmarks/bench_backup.py [--files N] [--work-dir DIR]
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_extract import make_tarball  # noqa: E402
+from windsurf_engine import SNAPSHOT_STRATEGIES, snapshot_tree, stream_extract  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000, help="number of small files")
+    parser.add_argument("--work-dir", help="directory to run in (selects the filesystem)")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="windsurf_bench_", dir=args.work_dir))
+    try:
+        tarball = work / "windsurf-synthetic.tar.gz"
+        make_tarball(tarball, args.files)
+        install = work / "install"
+        stream_extract(tarball, install)
+        install = install / "Windsurf"
+        total = sum(p.stat().st_size for p in install.rglob("*") if p.is_file())
+        print(f"Installation: {total / 1e6:.1f} MB, {args.files} small files")
+
+        for strategy in SNAPSHOT_STRATEGIES:
+            backup = work / f"backup_{strategy}"
+            start = time.perf_counter()
+            try:
+                written = snapshot_tree(install, backup, strategy)
+            except OSError as e:
+                print(f"{strategy:<10} unavailable ({e.strerror})")
+                continue
+            finally:
+                elapsed = time.perf_counter() - start
+            print(f"{strategy:<10} {elapsed:6.2f}s  {written / 1e6:8.1f} MB written")
+            shutil.rmtree(backup, ignore_errors=True)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Compare the previous two-pass extraction with the single-pass streaming one.
+
+Generates a synthetic Windsurf-shaped tarball (one nested root directory, a
+few large binaries and many small JS files) and times the old code path
+against streaming extraction with each available decompression backend.
+
+Usage: python benchmarks/bench_extract.py [--files N] [--repeat N]
+"""
+
+import argparse
+import functools
+import gzip
+import io
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from windsurf_engine import GZIP_DECOMPRESSORS, stream_extract  # noqa: E402
+
+
+def make_tarball(path, small_files, large_files=3, large_size=8 * 1024 * 1024,
+                 symlinks=0, seed=0, revision=0):
+    """
+    Write a synthetic Windsurf-like tarball to path.
+
+    The output is byte-for-byte reproducible for the same arguments. A
+    different revision changes the contents of every tenth small file and
+    of the first large file, like a point release.
+    """
+    rng = random.Random(seed)
+
+    def add(name, data, mode=0o644):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mode = mode
+        tar.addfile(info, io.BytesIO(data))
+
+    # No file name or timestamp in the gzip header, so the output is reproducible
+    with open(path, "wb") as raw, \
+            gzip.GzipFile(filename="", mode="wb", compresslevel=6, fileobj=raw, mtime=0) as compressed, \
+            tarfile.open(fileobj=compressed, mode="w") as tar:
+        add("Windsurf/windsurf", f"#!/bin/sh\n# revision {revision}\n".encode(), 0o755)
+        for i in range(large_files):
+            half = large_size // 2
+            data = rng.getrandbits(8 * half).to_bytes(half, "little") + bytes(large_size - half)
+            if i == 0 and revision:
+                data = revision.to_bytes(8, "little") + data[8:]
+            add(f"Windsurf/bin/large_{i}.bin", data, 0o755)
+        for i in range(small_files):
+            changed = revision if i % 10 == 0 else 0
+            data = (f"module.exports = {i + changed};\n" * (1 + i % 40)).encode()
+            add(f"Windsurf/resources/app/node_modules/pkg{i // 50}/lib/file{i}.js", data)
+        for i in range(min(symlinks, small_files)):
+            info = tarfile.TarInfo(f"Windsurf/resources/app/node_modules/.bin/cmd{i}")
+            info.type = tarfile.SYMTYPE
+            info.linkname = f"../pkg{i // 50}/lib/file{i}.js"
+            tar.addfile(info)
+
+
+def legacy_extract(tarball_path, dest_dir):
+    """The extraction loop used by UpdaterThread.run before streaming."""
+    with tarfile.open(tarball_path, "r:gz") as tar:
+        for member in tar.getmembers():
+            if member.name.startswith('/') or '..' in member.name:
+                raise Exception(f"Potentially unsafe path in tarball: {member.name}")
+        for member in tar.getmembers():
+            try:
+                tar.extract(member, path=dest_dir)
+            except Exception:
+                continue
+
+
+def time_extract(func, tarball_path, repeat, dest_root=None):
+    """Return the best wall time of func over repeat runs."""
+    best = None
+    for _ in range(repeat):
+        dest = Path(tempfile.mkdtemp(prefix="windsurf_bench_", dir=dest_root))
+        try:
+            start = time.perf_counter()
+            func(tarball_path, dest)
+            elapsed = time.perf_counter() - start
+        finally:
+            shutil.rmtree(dest, ignore_errors=True)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000, help="number of small files")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per strategy")
+    parser.add_argument("--dest-root", help="directory to extract into (e.g. a tmpfs)")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="windsurf_bench_"))
+    try:
+        tarball = work / "windsurf-synthetic.tar.gz"
+        make_tarball(tarball, args.files)
+        print(f"Tarball: {tarball.stat().st_size / 1e6:.1f} MB, {args.files} small files")
+
+        legacy = time_extract(legacy_extract, tarball, args.repeat, args.dest_root)
+        print(f"{'legacy (getmembers x2 + extract)':<34} {legacy:.2f}s")
+
+        backends = ["gzip", "threaded"]
+        backends += [name for name, cmd in GZIP_DECOMPRESSORS.items() if shutil.which(cmd[0])]
+        for backend in backends:
+            extract = functools.partial(stream_extract, backend=backend)
+            elapsed = time_extract(extract, tarball, args.repeat, args.dest_root)
+            label = f"streaming ({backend})"
+            print(f"{label:<34} {elapsed:.2f}s  speedup {legacy / elapsed:.2f}x")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Time restoring a backup with restore_backup() against a manual cp -r.
+
+Extracts a synthetic Windsurf-shaped tarball as the installation, copies it
+to a backup, then restores the backup with each method: the manual
+"clear the installation and cp -r the backup" approach, a rename of the
+backup into place, a reflink/hardlink snapshot that keeps the backup, and
+the streaming copy used when the backup is on another filesystem. A fresh
+backup is prepared (untimed) before each run.
+
+Usage: python benchmarks/bench_rollback.py [--files N] [--work-dir DIR]
+"""
+
+import argparse
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_extract import make_tarball  # noqa: E402
+from windsurf_engine import (  # noqa: E402
+    BACKUP_PREFIX, restore_backup, snapshot_tree, stream_extract,
+)
+
+
+def manual_restore(backup, install, work):
+    """What restoring a backup looked like before: clear, then cp -r."""
+    shutil.rmtree(install)
+    install.mkdir()
+    subprocess.run(["cp", "-r", f"{backup}/.", f"{install}/"], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000, help="number of small files")
+    parser.add_argument("--work-dir", help="directory to run in (selects the filesystem)")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="windsurf_bench_", dir=args.work_dir))
+    try:
+        tarball = work / "windsurf-synthetic.tar.gz"
+        make_tarball(tarball, args.files)
+        stream_extract(tarball, work / "extracted")
+        pristine = work / "extracted" / "Windsurf"
+        (pristine / "windsurf").touch()
+        total = sum(p.stat().st_size for p in pristine.rglob("*") if p.is_file())
+        print(f"Installation: {total / 1e6:.1f} MB, {args.files} small files")
+
+        methods = {
+            "cp -r": manual_restore,
+            "rename": lambda backup, install, work: restore_backup(
+                backup, install, backup_root=work),
+            "snapshot": lambda backup, install, work: restore_backup(
+                backup, install, keep_backup=True, backup_root=work),
+            "copy": lambda backup, install, work: restore_backup(
+                backup, install, keep_backup=True, backup_root=work, strategies=("copy",)),
+        }
+        for name, restore in methods.items():
+            install = work / "install"
+            backup = work / f"{BACKUP_PREFIX}bench"
+            snapshot_tree(pristine, install, "copy")
+            snapshot_tree(pristine, backup, "copy")
+            start = time.perf_counter()
+            restore(backup, install, work)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<10} {elapsed:6.2f}s")
+            for path in work.glob(BACKUP_PREFIX + "*"):
+                shutil.rmtree(path)
+            shutil.rmtree(install)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Measure the GUI's time to first paint.
+
+Starts the updater window in a fresh interpreter (with the offscreen Qt
+platform unless a display is set) and reports the time from launching the
+process to the first paint of the main window. Modal dialogs, such as the
+disclaimer, are accepted as soon as they appear, so the numbers are a lower
+bound for a real user. Each launch uses an empty home, cache and config;
+"repeat launch" runs again with the state left by the first one.
+
+Usage: python benchmarks/bench_startup.py [--repeat N]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+
+CHILD = """
+import sys
+sys.path.insert(0, {repo!r})
+from PyQt6.QtCore import QEvent, QObject, QTimer
+from PyQt6.QtWidgets import QApplication
+import windsurf_gui
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if (event.type() == QEvent.Type.Paint and obj.isWidgetType()
+                and isinstance(obj.window(), windsurf_gui.WindsurfUpdaterWindow)):
+            print("painted", flush=True)
+            QTimer.singleShot(0, app.quit)
+            app.removeEventFilter(self)
+        return False
+
+def accept_modal():
+    dialog = QApplication.activeModalWidget()
+    if dialog:
+        dialog.accept()
+
+app = QApplication(sys.argv[:1])
+first_paint = FirstPaint()
+app.installEventFilter(first_paint)
+timer = QTimer()
+timer.timeout.connect(accept_modal)
+timer.start(10)
+window = windsurf_gui.WindsurfUpdaterWindow()
+window.show()
+app.exec()
+"""
+
+
+def launch(home):
+    """Start the GUI with home as HOME and return the seconds to first paint."""
+    env = dict(os.environ, HOME=str(home))
+    # Installed copies have cached bytecode, so let the child write it
+    for name in ("XDG_CACHE_HOME", "XDG_CONFIG_HOME", "XDG_STATE_HOME", "PYTHONDONTWRITEBYTECODE"):
+        env.pop(name, None)
+    if not env.get("DISPLAY") and not env.get("WAYLAND_DISPLAY"):
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    start = time.perf_counter()
+    child = subprocess.Popen(
+        [sys.executable, "-c", CHILD.format(repo=str(REPO))],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    line = child.stdout.readline()
+    elapsed = time.perf_counter() - start
+    _, errors = child.communicate(timeout=30)
+    if line.strip() != "painted":
+        raise Exception(f"The window was never painted:\n{errors}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="launches to time")
+    args = parser.parse_args()
+
+    first, repeat = [], []
+    for _ in range(args.repeat):
+        home = Path(tempfile.mkdtemp(prefix="windsurf_bench_"))
+        try:
+            first.append(launch(home))
+            repeat.append(launch(home))
+        finally:
+            shutil.rmtree(home, ignore_errors=True)
+    print(f"{'first launch':<16} {min(first) * 1000:6.0f} ms (best of {args.repeat})")
+    print(f"{'repeat launch':<16} {min(repeat) * 1000:6.0f} ms (best of {args.repeat})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Run every update path on synthetic releases and write a JSON report.
+
+Generates two reproducible Windsurf-shaped tarballs (a few large binaries,
+many small JS files, symlinks and a nested root directory), the second one
+a point release of the first. Then runs each scenario in a fresh process:
+
+    extract/<backend>      stream_extract() with each decompression backend
+    extract/workers-<n>    stream_extract() with 1 and 4 writer threads
+    backup/<strategy>      create_snapshot() with each snapshot strategy
+    update/<mode>          run_update() in each mode, as UpdaterThread runs it
+    update/low-memory-<m>  run_update() with low_memory=True, full and delta
+    update/privileged      the pkexec helper in-process, as run_with_sudo runs it
+    rollback/<method>      restore_backup() by rename, snapshot and copy
+
+For each one the report records the wall time, the file data bytes the
+engine wrote, the peak RSS of the process and the read/write syscall counts
+and bytes from /proc/self/io (where available). Update and rollback
+scenarios also check the resulting installation against the expected
+release, so behaviour regressions show up as "ok": false. Low-memory
+scenarios whose peak RSS exceeds --max-rss-mb (default: the 128 MB ceiling
+documented for 100,000 files) are not ok either.
+
+Usage: python benchmarks/bench_suite.py [--files N] [--work-dir DIR]
+           [--only SUBSTRING] [--max-rss-mb MB] [--output REPORT.json]
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_extract import make_tarball  # noqa: E402
+from windsurf_engine import LOW_MEMORY_RSS_MB  # noqa: E402
+
+# Fields of /proc/self/io included in the report
+PROC_IO_FIELDS = ("rchar", "wchar", "syscr", "syscw", "read_bytes", "write_bytes")
+
+
+def read_proc_io():
+    """Return this process's I/O counters, or an empty dict if unavailable."""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+    except OSError:
+        return {}
+    return {name: int(fields[name]) for name in PROC_IO_FIELDS if name in fields}
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS of this process, so setup is not counted."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_kb():
+    """
+    Return the peak RSS of this process in KiB.
+
+    VmHWM is used where available: unlike ru_maxrss, it starts afresh in a
+    newly exec'd process instead of inheriting the parent's peak.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def tree_listing(root):
+    """Return {relative path: (kind, size or link target)} for a tree."""
+    listing = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root)
+            if os.path.islink(path):
+                listing[rel] = ("link", os.readlink(path))
+            elif name in filenames:
+                listing[rel] = ("file", os.path.getsize(path))
+            else:
+                listing[rel] = ("dir", 0)
+    return listing
+
+
+def copy_tree(src, dst):
+    """Copy a pristine tree for a scenario to modify (not timed)."""
+    from windsurf_engine import snapshot_tree
+
+    snapshot_tree(src, dst, "copy")
+
+
+def last_bytes_written(snapshots):
+    """Return the bytes written according to the last ProgressSnapshot."""
+    return snapshots[-1].bytes_written if snapshots else None
+
+
+def scenarios(data):
+    """
+    Return {name: prepare} for every scenario available on this machine.
+
+    prepare(work) sets up a scenario's inputs below work (untimed) and
+    returns (run, expected): run() performs the timed operation and returns
+    the file data bytes written (or None if unknown), and expected is the
+    tree the installation must match afterwards (or None).
+    """
+    from windsurf_engine import (
+        GZIP_DECOMPRESSORS, SNAPSHOT_STRATEGIES, UPDATE_MODES, ProgressTracker,
+        create_snapshot, restore_backup, run_update, stream_extract,
+    )
+    import windsurf_helper
+
+    old_release, new_release = data["old_release"], data["new_release"]
+    tarball = data["new_tarball"]
+    result = {}
+
+    backends = ["gzip", "threaded"]
+    backends += [name for name, cmd in GZIP_DECOMPRESSORS.items() if shutil.which(cmd[0])]
+    extract_options = [(f"extract/{backend}", {"backend": backend}) for backend in backends]
+    extract_options += [(f"extract/workers-{n}", {"workers": n}) for n in (1, 4)]
+    for name, options in extract_options:
+        def prepare(work, options=options):
+            def run():
+                progress = ProgressTracker()
+                stream_extract(tarball, work / "out", progress=progress, **options)
+                return progress.bytes_written
+            return run, None
+        result[name] = prepare
+
+    for strategy in SNAPSHOT_STRATEGIES:
+        def prepare(work, strategy=strategy):
+            install = work / "install"
+            copy_tree(old_release, install)
+
+            def run():
+                return create_snapshot(install, work / "backup", (strategy,))[1]
+            return run, None
+        result[f"backup/{strategy}"] = prepare
+
+    update_options = [(f"update/{mode}", mode, {}) for mode in UPDATE_MODES]
+    update_options += [(f"update/low-memory-{mode}", mode, {"low_memory": True})
+                       for mode in ("full", "delta")]
+    for name, mode, options in update_options:
+        def prepare(work, mode=mode, options=options):
+            install = work / "install"
+            copy_tree(old_release, install)
+            snapshots = []
+
+            def run():
+                run_update(tarball, install, mode, progress_listener=snapshots.append,
+                           backup_root=work, **options)
+                return last_bytes_written(snapshots)
+            return run, new_release
+        result[name] = prepare
+
+    def prepare_privileged(work):
+        install = work / "install"
+        copy_tree(old_release, install)
+
+        def run():
+            out = io.StringIO()
+            windsurf_helper.main(
+                ["--tarball", str(tarball), "--install-path", str(install),
+                 "--backup-root", str(work)],
+                out=out,
+            )
+            events = [json.loads(line) for line in out.getvalue().splitlines()]
+            done = events[-1]
+            if not done.get("success"):
+                raise Exception(done.get("message"))
+            return None
+        return run, new_release
+    result["update/privileged"] = prepare_privileged
+
+    for method, options in (
+        ("rename", {}),
+        ("snapshot", {"keep_backup": True}),
+        ("copy", {"keep_backup": True, "strategies": ("copy",)}),
+    ):
+        def prepare(work, options=options):
+            install = work / "install"
+            backup = work / "windsurf_backup_bench"
+            copy_tree(new_release, install)
+            copy_tree(old_release, backup)
+            snapshots = []
+
+            def run():
+                restore_backup(backup, install, progress_listener=snapshots.append,
+                               backup_root=work, **options)
+                return last_bytes_written(snapshots)
+            return run, old_release
+        result[f"rollback/{method}"] = prepare
+
+    return result
+
+
+def run_scenario(name, data, work_root, results, max_rss_kb=None):
+    """Run one scenario in this (fresh) process and put its result on results."""
+    from windsurf_engine import UNSUPPORTED_ERRNOS
+
+    work = Path(tempfile.mkdtemp(prefix="scenario_", dir=work_root))
+    report = {"scenario": name}
+    try:
+        run, expected = scenarios(data)[name](work)
+        reset_peak_rss()
+        io_before = read_proc_io()
+        start = time.perf_counter()
+        written = run()
+        report["wall_s"] = round(time.perf_counter() - start, 4)
+        io_after = read_proc_io()
+        report["bytes_written"] = written
+        report["peak_rss_kb"] = peak_rss_kb()
+        report["io"] = {key: io_after[key] - io_before[key] for key in io_after}
+        if expected is not None:
+            report["ok"] = tree_listing(work / "install") == tree_listing(expected)
+        else:
+            report["ok"] = True
+        if max_rss_kb and "low-memory" in name and report["peak_rss_kb"] > max_rss_kb:
+            report["ok"] = False
+            report["error"] = f"Peak RSS is over the {max_rss_kb // 1024} MB ceiling"
+    except Exception as e:
+        if isinstance(e, OSError) and e.errno in UNSUPPORTED_ERRNOS and name.startswith("backup/"):
+            # A snapshot strategy this filesystem cannot do is not a failure
+            report["ok"] = True
+            report["unsupported"] = e.strerror
+        else:
+            report["ok"] = False
+            report["error"] = f"{type(e).__name__}: {str(e)}"
+            report["traceback"] = traceback.format_exc()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    results.put(report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000, help="number of small files")
+    parser.add_argument("--large-files", type=int, default=3, help="number of large binaries")
+    parser.add_argument("--symlinks", type=int, default=200, help="number of symlinks")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic data")
+    parser.add_argument("--work-dir", help="directory to run in (selects the filesystem)")
+    parser.add_argument("--only", help="only run scenarios whose name contains this")
+    parser.add_argument("--max-rss-mb", type=int, default=LOW_MEMORY_RSS_MB,
+                        help="fail low-memory scenarios whose peak RSS exceeds this (0: no limit)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="windsurf_bench_", dir=args.work_dir))
+    # Keep the engine's caches and configuration out of the user's home
+    os.environ["XDG_CACHE_HOME"] = str(work / "cache")
+    os.environ["XDG_CONFIG_HOME"] = str(work / "config")
+    try:
+        from windsurf_engine import stream_extract
+
+        data = {}
+        for key, revision in (("old", 0), ("new", 1)):
+            tarball = work / f"windsurf-synthetic-{key}.tar.gz"
+            make_tarball(tarball, args.files, args.large_files, symlinks=args.symlinks,
+                         seed=args.seed, revision=revision)
+            stream_extract(tarball, work / f"release-{key}")
+            data[f"{key}_tarball"] = tarball
+            data[f"{key}_release"] = work / f"release-{key}" / "Windsurf"
+
+        names = [name for name in scenarios(data) if not args.only or args.only in name]
+        # A fresh process per scenario, so peak RSS and I/O counters are its own
+        context = multiprocessing.get_context("spawn")
+        results = []
+        for name in names:
+            queue = context.Queue()
+            max_rss_kb = args.max_rss_mb * 1024 if args.max_rss_mb else None
+            process = context.Process(target=run_scenario,
+                                      args=(name, data, work, queue, max_rss_kb))
+            process.start()
+            results.append(queue.get())
+            process.join()
+            result = results[-1]
+            outcome = "unsupported" if "unsupported" in result else result.get("wall_s", "error")
+            print(f"{name:<24} {outcome}", file=sys.stderr)
+
+        report = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "files": args.files,
+            "large_files": args.large_files,
+            "symlinks": args.symlinks,
+            "seed": args.seed,
+            "tarball_bytes": data["new_tarball"].stat().st_size,
+            "results": results,
+        }
+        text = json.dumps(report, indent=2, default=str)
+        if args.output:
+            Path(args.output).write_text(text + "\n")
+        else:
+            print(text)
+        return 0 if all(result["ok"] for result in results) else 1
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Time streaming extraction with different numbers of writer threads.
+
+Generates a synthetic Windsurf-shaped tarball dominated by small files and
+extracts it with stream_extract() using 1, 2, 4 and 8 writer threads. With
+one worker, every file is written on the reading thread and no pool is
+started, so the first row is the serial baseline the pools are measured
+against.
+
+Usage: python benchmarks/bench_writers.py [--files N] [--repeat N] [--dest-root DIR]
+"""
+
+import argparse
+import functools
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_extract import make_tarball, time_extract  # noqa: E402
+from windsurf_engine import stream_extract  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=50000, help="number of small files")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per worker count")
+    parser.add_argument("--dest-root", help="directory to extract into (selects the filesystem)")
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="worker counts to time"
+    )
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="windsurf_bench_"))
+    try:
+        tarball = work / "windsurf-synthetic.tar.gz"
+        make_tarball(tarball, args.files, large_files=1)
+        print(f"Tarball: {tarball.stat().st_size / 1e6:.1f} MB, {args.files} small files")
+
+        baseline = None
+        for workers in args.workers:
+            extract = functools.partial(stream_extract, workers=workers)
+            elapsed = time_extract(extract, tarball, args.repeat, args.dest_root)
+            baseline = baseline or elapsed
+            label = f"{workers} writer{'s' if workers != 1 else ''}"
+            print(f"{label:<12} {elapsed:6.2f}s  speedup {baseline / elapsed:.2f}x")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
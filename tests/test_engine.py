@@ -0,0 +1,608 @@
+"""Behaviour checks for the update engine on small synthetic tarballs."""
+
+import errno
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import windsurf_engine  # noqa: E402
+from windsurf_engine import (  # noqa: E402
+    BackupStore, delta_update, fleet_update, restore_backup, run_update, stream_extract,
+    unique_targets,
+)
+
+
+def make_tar(path, members):
+    """
+    Write a gzip tarball to path from (name, kind, value) tuples.
+
+    kind is "file" (value is the data), "dir", "symlink" or "hardlink"
+    (value is the link name).
+    """
+    with tarfile.open(path, "w:gz") as tar:
+        for name, kind, value in members:
+            info = tarfile.TarInfo(name)
+            if kind == "file":
+                info.size = len(value)
+                info.mode = 0o644
+                tar.addfile(info, io.BytesIO(value))
+                continue
+            info.type = {"dir": tarfile.DIRTYPE, "symlink": tarfile.SYMTYPE,
+                         "hardlink": tarfile.LNKTYPE}[kind]
+            info.mode = 0o755
+            if kind != "dir":
+                info.linkname = value
+            tar.addfile(info)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def isolated_home(tmp_path, monkeypatch):
+    """Keep the engine's caches, state and backups out of the real home."""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    cache = home / ".cache" / "windsurf-updater"
+    state = home / ".local" / "state" / "windsurf-updater"
+    paths = {
+        "CACHE_DIR": cache,
+        "REPACK_CACHE_DIR": cache / "repacked",
+        "INSTALL_INDEX_FILE": cache / "installs.json",
+        "TARBALL_INDEX_DIR": cache / "tarball-index",
+        "STATE_DIR": state,
+        "RUN_LOG_FILE": state / "runs.jsonl",
+        "CONFIG_FILE": home / ".config" / "windsurf-updater" / "config.json",
+    }
+    for name, path in paths.items():
+        monkeypatch.setattr(windsurf_engine, name, path)
+    return home
+
+
+CHAINED_LINK_ESCAPE = [
+    ("Windsurf", "dir", None),
+    ("Windsurf/t", "symlink", "."),
+    ("Windsurf/s", "symlink", "t/t/t/../../.."),
+    ("Windsurf/s/PWNED", "file", b"pwned\n"),
+]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_chained_symlinks_cannot_escape(tmp_path, workers):
+    tarball = make_tar(tmp_path / "evil.tar.gz", CHAINED_LINK_ESCAPE)
+    dest = tmp_path / "a" / "b" / "extract"
+    dest.mkdir(parents=True)
+    with pytest.raises(Exception, match="unsafe"):
+        stream_extract(tarball, dest, workers=workers)
+    assert not list(tmp_path.rglob("PWNED"))
+
+
+def test_external_decompressor_writing_to_stderr_does_not_stall(tmp_path, monkeypatch):
+    # More diagnostics than a pipe holds, before any output
+    chatty = [sys.executable, "-c", "import gzip, sys; sys.stderr.write('x' * 1000000); "
+              "sys.stdout.buffer.write(gzip.decompress(sys.stdin.buffer.read()))"]
+    monkeypatch.setitem(windsurf_engine.GZIP_DECOMPRESSORS, "chatty", chatty)
+    tarball = make_tar(tmp_path / "new.tar.gz", [("Windsurf/windsurf", "file", b"new\n")])
+    stream_extract(tarball, tmp_path / "out", backend="chatty")
+    assert (tmp_path / "out" / "Windsurf" / "windsurf").read_bytes() == b"new\n"
+
+
+@pytest.mark.parametrize("members", [
+    [("Windsurf", "dir", None), ("Windsurf/up", "symlink", ".."), ("Windsurf/up/x", "file", b"x")],
+    [("Windsurf", "dir", None), ("Windsurf/l", "symlink", "sub"), ("Windsurf/l", "file", b"x")],
+    [("Windsurf", "dir", None), ("Windsurf/abs", "symlink", "/etc")],
+    [("Windsurf", "dir", None), ("Windsurf/a", "symlink", "b"), ("Windsurf/b", "symlink", "a"),
+     ("Windsurf/c", "symlink", "a/x")],
+])
+def test_unsafe_links_are_rejected(tmp_path, members):
+    tarball = make_tar(tmp_path / "evil.tar.gz", members)
+    with pytest.raises(Exception, match="unsafe"):
+        stream_extract(tarball, tmp_path / "extract", workers=1)
+
+
+def test_links_inside_the_root_are_extracted(tmp_path):
+    tarball = make_tar(tmp_path / "good.tar.gz", [
+        ("Windsurf", "dir", None),
+        ("Windsurf/bin", "dir", None),
+        ("Windsurf/bin/app", "file", b"#!/bin/sh\n"),
+        ("Windsurf/current", "symlink", "bin"),
+        ("Windsurf/launcher", "symlink", "current/app"),
+        ("Windsurf/copy", "hardlink", "Windsurf/bin/app"),
+    ])
+    stream_extract(tarball, tmp_path / "extract", workers=1)
+    root = tmp_path / "extract" / "Windsurf"
+    assert (root / "launcher").read_bytes() == b"#!/bin/sh\n"
+    assert (root / "copy").read_bytes() == b"#!/bin/sh\n"
+
+
+@pytest.mark.parametrize("members", [
+    [("Windsurf/lib/module.js", "file", b"new\n")],
+    [("Windsurf/lib/sub", "dir", None)],
+    [("Windsurf/lib/sub/deep/module.js", "file", b"new\n")],
+])
+def test_delta_does_not_write_through_installed_symlink(tmp_path, members):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    install = tmp_path / "install"
+    install.mkdir()
+    (install / "lib").symlink_to(outside)
+    tarball = make_tar(tmp_path / "new.tar.gz", members + [("Windsurf/app", "file", b"app\n")])
+    warnings = []
+    delta_update(tarball, install, warnings.append)
+    assert not list(outside.iterdir())
+    assert (install / "app").read_bytes() == b"app\n"
+    assert any("lib is a symlink" in warning for warning in warnings)
+
+
+def test_delta_writes_only_what_changed(tmp_path):
+    install = tmp_path / "install"
+    stream_extract(make_tar(tmp_path / "old.tar.gz", [
+        ("Windsurf", "dir", None),
+        ("Windsurf/same.js", "file", b"same\n"),
+        ("Windsurf/changed.js", "file", b"old\n"),
+        ("Windsurf/gone.js", "file", b"gone\n"),
+        ("Windsurf/link", "symlink", "same.js"),
+    ]), tmp_path / "old")
+    (tmp_path / "old" / "Windsurf").rename(install)
+    same_inode = (install / "same.js").stat().st_ino
+
+    stats = delta_update(make_tar(tmp_path / "new.tar.gz", [
+        ("Windsurf", "dir", None),
+        ("Windsurf/same.js", "file", b"same\n"),
+        ("Windsurf/changed.js", "file", b"new\n"),
+        ("Windsurf/added/file.js", "file", b"added\n"),
+        ("Windsurf/link", "symlink", "changed.js"),
+    ]), install)
+
+    assert (install / "same.js").stat().st_ino == same_inode
+    assert (install / "changed.js").read_bytes() == b"new\n"
+    assert (install / "added" / "file.js").read_bytes() == b"added\n"
+    assert os.readlink(install / "link") == "changed.js"
+    assert not (install / "gone.js").exists()
+    assert (stats["written"], stats["unchanged"], stats["removed"]) == (3, 1, 1)
+    assert not list(install.rglob("*" + windsurf_engine.PARTIAL_SUFFIX))
+
+
+def test_fleet_backups_survive_retention(tmp_path, isolated_home):
+    tarball = make_tar(tmp_path / "new.tar.gz", [("Windsurf/app", "file", b"new\n")])
+    targets = []
+    for i in range(7):
+        target = tmp_path / f"t{i}"
+        target.mkdir()
+        (target / "app").write_bytes(b"old\n")
+        targets.append(str(target))
+    results = fleet_update(tarball, targets + [str(tmp_path / "t0" / ".")], jobs=4)
+    assert sorted(results) == targets
+    assert all(success for success, _ in results.values())
+
+    store = BackupStore()
+    assert len(store.list_backups()) == 7
+    assert store.prune(keep_count=5) == []
+    assert len(store.list_backups()) == 7
+
+
+def test_fleet_targets_have_their_own_progress_and_run_record(tmp_path, isolated_home):
+    targets = [str(make_install(tmp_path / name)) for name in ("a", "b")]
+    tarball = make_tar(tmp_path / "new.tar.gz", [("Windsurf/windsurf", "file", b"new\n")])
+    snapshots = {}
+    results = fleet_update(tarball, targets, progress_listener=lambda target, snapshot:
+                           snapshots.setdefault(target, []).append(snapshot))
+    assert all(success for success, message in results.values())
+    assert set(snapshots) == {None, *targets}
+    for target in targets:
+        assert [s.phase for s in snapshots[target]][-1] == "done"
+        assert snapshots[target][-1].files == 2
+
+    records = [json.loads(line) for line in windsurf_engine.RUN_LOG_FILE.read_text().splitlines()]
+    assert sorted(record["install_path"] for record in records) == targets
+    for record in records:
+        assert record["success"]
+        assert [phase["name"] for phase in record["phases"]] == ["backup", "install"]
+
+
+def test_retention_applies_per_installation(isolated_home):
+    for stamp in range(1000, 1004):
+        for slug in ("opt-windsurf", "home-me-windsurf"):
+            (isolated_home / f"windsurf_backup_{stamp}_{slug}").mkdir()
+    store = BackupStore()
+    removed = store.prune(keep_count=2)
+    assert sorted(p.name for p in removed) == [
+        "windsurf_backup_1000_home-me-windsurf", "windsurf_backup_1000_opt-windsurf",
+        "windsurf_backup_1001_home-me-windsurf", "windsurf_backup_1001_opt-windsurf",
+    ]
+
+
+def test_unique_targets(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "link").symlink_to(tmp_path / "a")
+    assert unique_targets([str(tmp_path / "a"), str(tmp_path / "link"), str(tmp_path / "a/")]) == [
+        str(tmp_path / "a")
+    ]
+
+
+def test_second_pass_over_tarball_has_its_own_progress():
+    progress = windsurf_engine.ProgressTracker(compressed_total=4000)
+    progress.start_phase("extract", 2, 40, measure="compressed")
+    progress.add_compressed(4000)
+    assert progress.snapshot().percent == 40
+    progress.start_phase("install", 40, 90, measure="compressed", total=4000)
+    snapshot = progress.snapshot()
+    assert snapshot.percent == 40
+    assert (snapshot.compressed_read, snapshot.compressed_total) == (0, 4000)
+    progress.add_compressed(2000)
+    snapshot = progress.snapshot()
+    assert snapshot.percent == 65
+    assert (snapshot.compressed_read, snapshot.compressed_total) == (2000, 4000)
+
+
+def truncated_tarball(tmp_path):
+    """Return a tarball cut off in the middle of its data."""
+    tarball = make_tar(tmp_path / "full.tar.gz", [
+        (f"Windsurf/file{i}", "file", os.urandom(64 * 1024)) for i in range(16)
+    ])
+    data = tarball.read_bytes()
+    truncated = tmp_path / "truncated.tar.gz"
+    truncated.write_bytes(data[:len(data) // 2])
+    return truncated
+
+
+def make_install(tmp_path):
+    install = tmp_path / "apps" / "windsurf"
+    install.mkdir(parents=True)
+    (install / "windsurf").write_bytes(b"old\n")
+    return install
+
+
+@pytest.mark.parametrize("mode", ["full", "staged"])
+def test_failed_update_leaves_no_staging_directory(tmp_path, mode):
+    install = make_install(tmp_path)
+    with pytest.raises(Exception):
+        run_update(truncated_tarball(tmp_path), install, mode, backup_root=tmp_path)
+    assert sorted(p.name for p in install.parent.iterdir()) == ["windsurf"]
+    assert (install / "windsurf").read_bytes() == b"old\n"
+
+
+def test_stale_staging_directories_are_swept(tmp_path):
+    install = make_install(tmp_path)
+    dead = subprocess.Popen([sys.executable, "-c", ""])
+    dead.wait()
+    orphan = install.with_name(f".windsurf_staging_{dead.pid}_x")
+    (orphan / "windsurf").mkdir(parents=True)
+    old = install.with_name(f".windsurf_staging_{os.getpid()}_old")
+    old.mkdir()
+    os.utime(old, (0, 0))
+    live = install.with_name(f".windsurf_staging_{os.getpid()}_live")
+    live.mkdir()
+
+    tarball = make_tar(tmp_path / "new.tar.gz", [("Windsurf/windsurf", "file", b"new\n")])
+    run_update(tarball, install, "staged", backup_root=tmp_path)
+    assert sorted(p.name for p in install.parent.iterdir()) == [live.name, "windsurf"]
+
+
+def test_staged_update_reports_missing_parent(tmp_path):
+    tarball = make_tar(tmp_path / "new.tar.gz", [("Windsurf/windsurf", "file", b"new\n")])
+    with pytest.raises(Exception, match="parent directory .* does not exist"):
+        run_update(tarball, tmp_path / "missing" / "windsurf", "staged", backup_root=tmp_path)
+
+
+def test_staged_update_survives_failed_backup_after_swap(tmp_path, monkeypatch):
+    install = make_install(tmp_path)
+    tarball = make_tar(tmp_path / "new.tar.gz", [("Windsurf/windsurf", "file", b"new\n")])
+
+    def fail(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(windsurf_engine, "retire_installation", fail)
+
+    messages = []
+    run_update(tarball, install, "staged", messages.append, start_time=1000, backup_root=tmp_path)
+    assert (install / "windsurf").read_bytes() == b"new\n"
+    previous = install.with_name("windsurf.previous-1000")
+    assert (previous / "windsurf").read_bytes() == b"old\n"
+    assert sorted(p.name for p in install.parent.iterdir()) == ["windsurf", "windsurf.previous-1000"]
+    assert any(str(previous) in message for message in messages)
+
+
+def test_rollback_restores_the_installation_backup(tmp_path, isolated_home):
+    install = make_install(tmp_path)
+    tarball = make_tar(tmp_path / "new.tar.gz", [("Windsurf/windsurf", "file", b"new\n")])
+    run_update(tarball, install, "full", start_time=1000)
+    assert (install / "windsurf").read_bytes() == b"new\n"
+
+    backups = BackupStore().list_backups(install)
+    assert len(backups) == 1
+    restore_backup(backups[0], install)
+    assert (install / "windsurf").read_bytes() == b"old\n"
+    # The replaced installation became a backup, so the rollback can be undone
+    (undo,) = BackupStore().list_backups(install)
+    assert (undo / "windsurf").read_bytes() == b"new\n"
+
+
+def test_rollback_survives_failed_backup_after_swap(tmp_path, isolated_home, monkeypatch):
+    install = make_install(tmp_path)
+    tarball = make_tar(tmp_path / "new.tar.gz", [("Windsurf/windsurf", "file", b"new\n")])
+    run_update(tarball, install, "full", start_time=1000)
+    (backup,) = BackupStore().list_backups(install)
+
+    def fail(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(windsurf_engine, "retire_installation", fail)
+
+    messages = []
+    restore_backup(backup, install, status_callback=messages.append)
+    assert (install / "windsurf").read_bytes() == b"old\n"
+    (previous,) = install.parent.glob("windsurf.previous-*")
+    assert (previous / "windsurf").read_bytes() == b"new\n"
+    assert not list(install.parent.glob(".windsurf_staging_*"))
+    assert any(str(previous) in message for message in messages)
+    assert messages[-1] == "Rollback completed successfully!"
+
+
+def test_rollback_refuses_a_backup_of_another_installation(tmp_path, isolated_home):
+    install = make_install(tmp_path)
+    other = tmp_path / "other" / "windsurf"
+    other.mkdir(parents=True)
+    (other / "windsurf").write_bytes(b"other\n")
+    tarball = make_tar(tmp_path / "new.tar.gz", [("Windsurf/windsurf", "file", b"new\n")])
+    fleet_update(tarball, [str(install), str(other)])
+
+    store = BackupStore()
+    assert len(store.list_backups()) == 2
+    (own,) = store.list_backups(install)
+    assert (own / "windsurf").read_bytes() == b"old\n"
+    (foreign,) = store.list_backups(other)
+    with pytest.raises(Exception, match="another installation"):
+        restore_backup(foreign, install)
+    assert (install / "windsurf").read_bytes() == b"new\n"
+
+
+def test_other_users_installations_are_never_the_default(tmp_path, monkeypatch):
+    def install(path):
+        path.mkdir(parents=True)
+        (path / "windsurf").write_bytes(b"#!/bin/sh\n")
+        return path
+
+    theirs = install(tmp_path / "home" / "alice" / "windsurf")
+    mine = install(tmp_path / "mine" / "windsurf")
+    monkeypatch.setattr(windsurf_engine, "candidate_install_locations", lambda: [])
+    monkeypatch.setattr(windsurf_engine, "other_user_install_locations", lambda: [theirs])
+    monkeypatch.setattr(windsurf_engine, "desktop_entry_executables", lambda: [])
+    monkeypatch.setattr(windsurf_engine, "running_executables", lambda: iter(()))
+    monkeypatch.setattr(windsurf_engine.shutil, "which", lambda name: str(mine / "windsurf"))
+
+    assert windsurf_engine.find_windsurf_installation() == str(mine)
+    assert windsurf_engine.find_windsurf_installations() == [str(mine), str(theirs)]
+
+
+@pytest.mark.parametrize("mode", ["full", "staged", "delta"])
+def test_tarball_without_root_directory_is_the_whole_release(tmp_path, mode):
+    install = make_install(tmp_path)
+    tarball = make_tar(tmp_path / "flat.tar.gz", [
+        ("windsurf", "file", b"new\n"),
+        ("resources", "dir", None),
+        ("resources/x", "file", b"x\n"),
+    ])
+    run_update(tarball, install, mode, backup_root=tmp_path)
+    assert (install / "windsurf").read_bytes() == b"new\n"
+    assert (install / "resources" / "x").read_bytes() == b"x\n"
+
+
+@pytest.mark.parametrize("mode", ["full", "staged"])
+def test_members_outside_the_first_root_use_the_whole_extraction(tmp_path, mode):
+    install = make_install(tmp_path)
+    tarball = make_tar(tmp_path / "flat.tar.gz", [
+        ("resources/x", "file", b"x\n"),
+        ("windsurf", "file", b"new\n"),
+    ])
+    run_update(tarball, install, mode, backup_root=tmp_path)
+    assert (install / "windsurf").read_bytes() == b"new\n"
+    assert (install / "resources" / "x").read_bytes() == b"x\n"
+
+
+def test_manifest_cache_misses_after_a_file_changes(tmp_path, monkeypatch):
+    hashed = []
+    hash_file = windsurf_engine.hash_file
+    monkeypatch.setattr(windsurf_engine, "hash_file", lambda path: hashed.append(path) or hash_file(path))
+    path = tmp_path / "file.js"
+    path.write_bytes(b"old\n")
+
+    with windsurf_engine.ManifestCache(tmp_path / "cache.sqlite3") as cache:
+        first = cache.digest(path)
+        assert cache.digest(path) == first
+    assert len(hashed) == 1
+
+    path.write_bytes(b"new content\n")
+    with windsurf_engine.ManifestCache(tmp_path / "cache.sqlite3") as cache:
+        assert cache.digest(path) != first
+    assert len(hashed) == 2
+
+
+def test_manifest_cache_is_discarded_when_the_hash_changes(tmp_path, monkeypatch):
+    with windsurf_engine.ManifestCache(tmp_path / "cache.sqlite3") as cache:
+        cache.store(1, 2, 3, 4, "digest")
+    monkeypatch.setattr(windsurf_engine, "HASH_NAME", "other-hash")
+    with windsurf_engine.ManifestCache(tmp_path / "cache.sqlite3") as cache:
+        assert cache.lookup(1, 2, 3, 4) is None
+
+
+def test_manifest_cache_evicts_least_recently_used(tmp_path):
+    def open_cache(now, **kwargs):
+        cache = windsurf_engine.ManifestCache(tmp_path / "cache.sqlite3", **kwargs)
+        cache.now = now
+        return cache
+
+    for now, ino in [(1000, 1), (2000, 2), (3000, 3)]:
+        with open_cache(now) as cache:
+            cache.store(1, ino, 10, 10, f"digest{ino}")
+    # A hit counts as a use, so the first entry outlives the second
+    with open_cache(4000, max_entries=2) as cache:
+        assert cache.lookup(1, 1, 10, 10) == "digest1"
+    with open_cache(4000) as cache:
+        assert [cache.lookup(1, ino, 10, 10) for ino in (1, 2, 3)] == ["digest1", None, "digest3"]
+
+    # Entries unused for longer than the age limit are dropped
+    with open_cache(4000 + windsurf_engine.MANIFEST_CACHE_MAX_AGE_DAYS * 86400 + 1):
+        pass
+    with open_cache(0) as cache:
+        assert [cache.lookup(1, ino, 10, 10) for ino in (1, 2, 3)] == [None, None, None]
+
+
+def make_tree(root):
+    (root / "sub").mkdir(parents=True)
+    (root / "sub" / "file.js").write_bytes(b"data\n")
+    (root / "link").symlink_to("sub/file.js")
+    return root
+
+
+def unsupported(err):
+    def op(src, dst):
+        # Leave a partial file behind, as a failed clone can
+        open(dst, "wb").close()
+        raise OSError(err, os.strerror(err))
+    return op
+
+
+@pytest.mark.parametrize("failing, expected", [
+    (["reflink"], "hardlink"),
+    (["reflink", "hardlink"], "copy"),
+])
+def test_snapshot_falls_back_to_the_next_strategy(tmp_path, monkeypatch, failing, expected):
+    src = make_tree(tmp_path / "src")
+    for strategy in failing:
+        monkeypatch.setitem(windsurf_engine.SNAPSHOT_FILE_OPS, strategy, unsupported(errno.EXDEV))
+    messages = []
+    strategy, written = windsurf_engine.create_snapshot(src, tmp_path / "dst", status_callback=messages.append)
+
+    assert strategy == expected
+    assert len(messages) == len(failing)
+    copied = tmp_path / "dst" / "sub" / "file.js"
+    assert copied.read_bytes() == b"data\n"
+    assert os.readlink(tmp_path / "dst" / "link") == "sub/file.js"
+    assert (copied.stat().st_ino == (src / "sub" / "file.js").stat().st_ino) == (expected == "hardlink")
+    assert written == (5 if expected == "copy" else 0)
+
+
+def test_snapshot_does_not_fall_back_on_other_errors(tmp_path, monkeypatch):
+    src = make_tree(tmp_path / "src")
+    monkeypatch.setitem(windsurf_engine.SNAPSHOT_FILE_OPS, "reflink", unsupported(errno.EIO))
+    with pytest.raises(OSError) as raised:
+        windsurf_engine.create_snapshot(src, tmp_path / "dst")
+    assert raised.value.errno == errno.EIO
+
+
+def test_discovery_index_is_revalidated_without_rescanning(tmp_path, monkeypatch):
+    apps = tmp_path / "apps"
+    install = make_install(tmp_path)
+    product = install / "resources" / "app" / "product.json"
+    product.parent.mkdir(parents=True)
+    product.write_text('{"windsurfVersion": "1.0"}')
+    monkeypatch.setattr(windsurf_engine, "discovery_watch_dirs", lambda: [str(apps)])
+    monkeypatch.setattr(windsurf_engine, "candidate_install_locations", lambda: [install])
+    monkeypatch.setattr(windsurf_engine, "other_user_install_locations", lambda: [])
+    monkeypatch.setattr(windsurf_engine, "desktop_entry_executables", lambda: iter(()))
+    monkeypatch.setattr(windsurf_engine, "running_executables", lambda: iter(()))
+    monkeypatch.setattr(windsurf_engine.shutil, "which", lambda name: None)
+    scans = []
+    scan_installations = windsurf_engine.scan_installations
+    monkeypatch.setattr(windsurf_engine, "scan_installations",
+                        lambda: scans.append(1) or scan_installations())
+    reads = []
+    installation_version = windsurf_engine.installation_version
+    monkeypatch.setattr(windsurf_engine, "installation_version",
+                        lambda location: reads.append(1) or installation_version(location))
+
+    discover = windsurf_engine.discover_installations
+    assert discover() == [windsurf_engine.InstallInfo(str(install), "1.0", "location")]
+    assert (len(scans), len(reads)) == (1, 1)
+    # Unchanged directories: the index is used and the version not re-read
+    assert discover() == [windsurf_engine.InstallInfo(str(install), "1.0", "location")]
+    assert (len(scans), len(reads)) == (1, 1)
+
+    # A changed version file is re-read, still without a scan
+    product.write_text('{"windsurfVersion": "2.0"}')
+    os.utime(product, ns=(0, 0))
+    assert discover()[0].version == "2.0"
+    assert (len(scans), len(reads)) == (1, 2)
+
+    # An indexed installation that is no longer one is dropped
+    (install / "windsurf").unlink()
+    assert discover() == []
+    assert len(scans) == 1
+
+    # A change in a watched directory triggers a new scan
+    (install / "windsurf").write_bytes(b"new\n")
+    (apps / "other").mkdir()
+    assert [info.path for info in discover()] == [str(install)]
+    assert len(scans) == 2
+
+
+@pytest.mark.parametrize("mode, fmt", [
+    ("w:gz", "gzip"), ("w:xz", "xz"), ("w:bz2", "bzip2"), ("w", "tar"),
+])
+def test_detect_compression(tmp_path, mode, fmt):
+    path = tmp_path / "release"
+    with tarfile.open(path, mode) as tar:
+        info = tarfile.TarInfo("Windsurf/windsurf")
+        info.size = 4
+        tar.addfile(info, io.BytesIO(b"new\n"))
+    assert windsurf_engine.detect_compression(path) == fmt
+
+
+def test_detect_compression_by_content_only(tmp_path):
+    zstd = tmp_path / "release.tar.gz"
+    zstd.write_bytes(b"\x28\xb5\x2f\xfd" + bytes(508))
+    assert windsurf_engine.detect_compression(zstd) == "zstd"
+    other = tmp_path / "release.tar"
+    other.write_bytes(b"PK\x03\x04" + bytes(508))
+    with pytest.raises(Exception, match="Unrecognised tarball format"):
+        windsurf_engine.detect_compression(other)
+
+
+def test_repack_cache_reuse_and_invalidation(tmp_path):
+    cache = windsurf_engine.RepackCache(tmp_path / "repacked", keep=2)
+    tarball = make_tar(tmp_path / "new.tar.gz", [("Windsurf/windsurf", "file", b"new\n")])
+    assert cache.lookup(tarball) is None
+
+    # A failed extraction adds nothing
+    with pytest.raises(ValueError):
+        with cache.writer(tarball) as copy_to:
+            copy_to.write(b"partial")
+            raise ValueError
+    assert cache.lookup(tarball) is None
+    assert not list(cache.root.iterdir())
+
+    with cache.writer(tarball) as copy_to:
+        copy_to.write(b"plain tar")
+    copy = cache.lookup(tarball)
+    assert Path(copy).read_bytes() == b"plain tar"
+
+    # A rewritten tarball never matches the old copy
+    make_tar(tarball, [("Windsurf/windsurf", "file", b"newer\n")])
+    assert cache.lookup(tarball) is None
+
+    # Only the most recently used copies are kept
+    others = [make_tar(tmp_path / f"other{i}.tar.gz", [("Windsurf/windsurf", "file", b"x\n")])
+              for i in range(2)]
+    for other in others:
+        with cache.writer(other) as copy_to:
+            copy_to.write(b"plain tar")
+    assert [cache.lookup(other) is not None for other in others] == [True, True]
+    assert sorted(cache.root.iterdir()) == sorted(Path(cache.lookup(other)) for other in others)
+
+
+def test_update_reads_the_repacked_copy(tmp_path):
+    install = make_install(tmp_path)
+    tarball = make_tar(tmp_path / "new.tar.gz", [("Windsurf/windsurf", "file", b"new\n")])
+    run_update(tarball, install, "full", backup_root=tmp_path, repack=True)
+    assert windsurf_engine.RepackCache().lookup(tarball) is not None
+
+    messages = []
+    run_update(tarball, install, "delta", messages.append, backup_root=tmp_path)
+    assert "Reading the cached uncompressed copy of the tarball" in messages
+    assert (install / "windsurf").read_bytes() == b"new\n"
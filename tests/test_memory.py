@@ -0,0 +1,97 @@
+"""
+Peak-RSS check of low-memory updates on a 100,000-entry synthetic release.
+
+Each update runs in a fresh interpreter, so its VmHWM is its own. The
+ceiling is the one documented in the README and checked by the benchmark
+suite. This takes a minute or two; deselect it with -k "not memory".
+"""
+
+import gzip
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from windsurf_engine import LOW_MEMORY_RSS_MB, stream_extract  # noqa: E402
+
+ENTRIES = 100000
+LARGE_FILE_SIZE = 8 * 1024 * 1024
+SYMLINKS = 200
+
+CHILD = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+from windsurf_engine import run_update
+run_update(sys.argv[2], sys.argv[3], sys.argv[4], backup_root=sys.argv[5], low_memory=True)
+with open("/proc/self/status") as f:
+    status = dict(line.split(":", 1) for line in f)
+print(json.dumps(int(status["VmHWM"].split()[0])))
+"""
+
+pytestmark = pytest.mark.skipif(
+    not os.path.exists("/proc/self/status"), reason="needs /proc/self/status for VmHWM"
+)
+
+
+def make_release(path, revision):
+    """
+    Write a release tarball with ENTRIES small files, a large one and SYMLINKS links.
+
+    A later revision changes every tenth small file and the launcher.
+    """
+    def add(name, data, mode=0o644):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mode = mode
+        tar.addfile(info, io.BytesIO(data))
+
+    with gzip.open(path, "wb", compresslevel=1) as compressed, \
+            tarfile.open(fileobj=compressed, mode="w") as tar:
+        add("Windsurf/windsurf", f"#!/bin/sh\n# revision {revision}\n".encode(), 0o755)
+        add("Windsurf/bin/large.bin", bytes([revision]) * LARGE_FILE_SIZE, 0o755)
+        for i in range(ENTRIES):
+            changed = revision if i % 10 == 0 else 0
+            add(f"Windsurf/resources/app/node_modules/pkg{i // 50}/lib/file{i}.js",
+                f"module.exports = {i + changed};\n".encode())
+        for i in range(SYMLINKS):
+            info = tarfile.TarInfo(f"Windsurf/resources/app/node_modules/.bin/cmd{i}")
+            info.type = tarfile.SYMTYPE
+            info.linkname = f"../pkg{i // 50}/lib/file{i}.js"
+            tar.addfile(info)
+
+
+@pytest.fixture(scope="module")
+def releases(tmp_path_factory):
+    """Return (old release tree, new tarball) with ENTRIES members each."""
+    work = tmp_path_factory.mktemp("releases")
+    old, new = work / "old.tar.gz", work / "new.tar.gz"
+    make_release(old, revision=0)
+    make_release(new, revision=1)
+    stream_extract(old, work / "old")
+    return work / "old" / "Windsurf", new
+
+
+@pytest.mark.parametrize("mode", ["full", "delta"])
+def test_low_memory_update_stays_under_ceiling(tmp_path, releases, mode):
+    old_release, tarball = releases
+    install = tmp_path / "install"
+    shutil.copytree(old_release, install, symlinks=True)
+    env = dict(os.environ, HOME=str(tmp_path), XDG_CACHE_HOME=str(tmp_path / "cache"),
+               XDG_CONFIG_HOME=str(tmp_path / "config"), XDG_STATE_HOME=str(tmp_path / "state"))
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, str(ROOT), str(tarball), str(install), mode, str(tmp_path)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    peak_kb = json.loads(result.stdout.splitlines()[-1])
+    assert peak_kb <= LOW_MEMORY_RSS_MB * 1024, f"peak RSS {peak_kb // 1024} MB"
+    assert (install / "windsurf").read_text() == "#!/bin/sh\n# revision 1\n"
+    assert len(list(install.rglob("*.js"))) == ENTRIES
@@ -0,0 +1,3136 @@
+"""
+Windsurf Updater engine - update logic shared by the GUI and the command line.
+
+This module must not import PyQt6 so that headless updates start quickly and
+work without a display. It is also imported when the GUI starts, so modules
+only needed by some operations (concurrent.futures, which pulls in logging)
+are imported where they are used.
+"""
+
+import bz2
+import cProfile
+import contextlib
+import ctypes
+import errno
+import fcntl
+import functools
+import gzip
+import hashlib
+import io
+import json
+import lzma
+import os
+import queue
+import shlex
+import shutil
+import sqlite3
+import stat
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+import zlib
+from collections import namedtuple
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Version information
+VERSION = "1.0.0"
+
+# Buffer size used when streaming file contents out of the tarball
+COPY_BUFSIZE = 1024 * 1024
+
+# External gzip decompressors, in order of preference. Each one is fed the
+# tarball on stdin and must write the decompressed tar to stdout.
+GZIP_DECOMPRESSORS = {
+    "pigz": ["pigz", "-dc"],
+    "igzip": ["igzip", "-dc"],
+}
+
+# External decompressors for each supported compression format, in order
+# of preference. Without one, the format is decompressed in-process.
+EXTERNAL_DECOMPRESSORS = {
+    "gzip": GZIP_DECOMPRESSORS,
+    "xz": {"xz": ["xz", "-dc", "-T0"]},
+    "bzip2": {"lbzip2": ["lbzip2", "-dc"], "pbzip2": ["pbzip2", "-dc"]},
+    "zstd": {"zstd": ["zstd", "-dc"]},
+}
+
+# In-process decompression backends for each format, preferred first
+INTERNAL_DECOMPRESSORS = {
+    "gzip": ("threaded", "gzip"),
+    "xz": ("python",),
+    "bzip2": ("python",),
+    "zstd": ("python",),
+    "tar": ("plain",),
+}
+
+# Leading bytes identifying each compression format
+COMPRESSION_MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"BZh", "bzip2"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+
+# File name endings offered when choosing a tarball
+TARBALL_SUFFIXES = (
+    ".tar.gz", ".tgz", ".tar.xz", ".txz", ".tar.bz2", ".tbz2", ".tar.zst", ".tzst", ".tar",
+)
+
+# Most symlinks followed when resolving a link target inside a tarball,
+# matching the kernel's limit
+MAX_LINK_HOPS = 40
+
+# Environment variable to force a decompression backend
+# (e.g. "pigz", "igzip", "threaded" or "gzip" for gzip tarballs)
+DECOMPRESSOR_ENV = "WINDSURF_UPDATER_DECOMPRESSOR"
+
+# Threads writing extracted files (1 writes on the reading thread), and the
+# most file data queued for them at once
+EXTRACT_WORKERS = 4
+WRITE_QUEUE_BYTES = 64 * 1024 * 1024
+
+# Minimum size charged to each queued file, so many tiny files are bounded too
+WRITE_QUEUE_MIN_CHARGE = 4096
+
+# Small files are handed to the writers in batches of up to this many files
+# or bytes, so the hand-off does not cost more than the writes it saves
+WRITE_BATCH_FILES = 64
+WRITE_BATCH_BYTES = 1024 * 1024
+
+# Maximum rate at which progress updates are delivered to listeners
+PROGRESS_MAX_HZ = 20
+
+# Per-file warnings shown individually in each phase before they are
+# only counted
+MAX_WARNINGS_PER_PHASE = 5
+
+# Update modes offered to the user
+UPDATE_MODES = {
+    "full": "Full (replace all files)",
+    "delta": "Incremental (only changed files)",
+    "staged": "Staged (extract beside the installation, then swap)",
+}
+
+# Files up to this size are compared in memory during a delta update; larger
+# ones are spooled to a temporary file next to their destination
+DELTA_BUFFER_LIMIT = 16 * 1024 * 1024
+
+# Peak RSS ceiling, in MB, of a low-memory update of a 100,000-file release
+# (documented in the README, checked by the tests and the benchmark suite)
+LOW_MEMORY_RSS_MB = 128
+
+# Suffix for files being written during a delta update before they are
+# renamed into place
+PARTIAL_SUFFIX = ".wsupd-partial"
+
+# Per-user cache directory for manifests and other derived data
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "windsurf-updater"
+
+# Per-user state directory; the run log is rotated once it exceeds
+# RUN_LOG_MAX_BYTES, keeping one previous file
+STATE_DIR = Path(os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state") / "windsurf-updater"
+RUN_LOG_FILE = STATE_DIR / "runs.jsonl"
+RUN_LOG_MAX_BYTES = 1024 * 1024
+
+# Set to profile updates and rollbacks with cProfile (see RunRecorder)
+PROFILE_ENV = "WINDSURF_UPDATER_PROFILE"
+
+# Per-user configuration file
+CONFIG_FILE = Path(os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config") / "windsurf-updater" / "config.json"
+
+# Configuration defaults. backup_keep_gb of None means no size limit.
+DEFAULT_CONFIG = {
+    "backup_keep_count": 5,
+    "backup_keep_gb": None,
+    "repack_cache": False,
+    "extract_workers": EXTRACT_WORKERS,
+    "disclaimer_accepted": False,
+    "low_memory": False,
+}
+
+# Uncompressed copies of applied tarballs (see RepackCache), and how many
+# of them to keep; each is as large as the unpacked release
+REPACK_CACHE_DIR = CACHE_DIR / "repacked"
+REPACK_CACHE_KEEP = 2
+
+# Staging directories are named <prefix><pid>_<random> next to the
+# installation; those of dead processes, or older than the age limit in
+# seconds, are left over from an interrupted run and removed
+STAGING_PREFIX = ".windsurf_staging_"
+STAGING_MAX_AGE = 24 * 3600
+
+# Backups are directories named <prefix><timestamp> in the home directory
+BACKUP_PREFIX = "windsurf_backup_"
+
+# Upper bound on cached file hashes; least recently used entries are
+# evicted first (about 100 bytes each on disk)
+MANIFEST_CACHE_MAX_ENTRIES = 500000
+
+# Cached hashes not looked up for this many days are dropped
+MANIFEST_CACHE_MAX_AGE_DAYS = 90
+
+# Index of discovered installations, revalidated by mtime on each launch
+INSTALL_INDEX_FILE = CACHE_DIR / "installs.json"
+INSTALL_INDEX_FORMAT = 2
+
+# Files holding an installation's version, relative to its root, and the key
+VERSION_FILES = (
+    ("resources/app/product.json", "windsurfVersion"),
+    ("resources/app/package.json", "version"),
+)
+
+# Sidecar indexes of release tarballs, and how many of them to keep
+TARBALL_INDEX_DIR = CACHE_DIR / "tarball-index"
+TARBALL_INDEX_KEEP = 8
+TARBALL_INDEX_FORMAT = 1
+
+# Backup strategies, cheapest first. Hardlinks are safe because updates
+# replace files rather than rewriting them in place.
+SNAPSHOT_STRATEGIES = ("reflink", "hardlink", "copy")
+
+# ioctl request to share a file's extents with another (btrfs, XFS)
+FICLONE = 0x40049409
+
+# renameat2() arguments for atomically swapping two paths (Linux 3.15+)
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+ProgressSnapshot = namedtuple(
+    "ProgressSnapshot",
+    ["phase", "percent", "compressed_read", "compressed_total", "bytes_written",
+     "files", "elapsed", "eta"],
+)
+
+PhaseTiming = namedtuple(
+    "PhaseTiming", ["name", "wall", "cpu", "files", "bytes_written", "compressed_read"]
+)
+
+
+class ProgressTracker:
+    """
+    Byte-accurate progress model for an update.
+
+    An update is split into phases, each owning a slice of the 0-100 range.
+    Within a phase, progress is measured by compressed bytes read from the
+    tarball, uncompressed bytes written or files processed since the phase
+    started, against a known total. The tarball may be read more than once
+    (a delta update verifies it before applying it), so snapshots report
+    the compressed bytes read by the current pass. Listeners receive ProgressSnapshot objects at no more than
+    max_hz per second (phase changes and completion are always delivered),
+    so a fast update cannot flood a GUI event loop.
+
+    Per-file warnings go through warn(): the first few of each phase are
+    passed on to status_callback and the rest are counted and summarised
+    when the phase ends. Each finished phase is recorded in phase_timings
+    as a PhaseTiming with its wall and CPU time (of the whole process, so
+    helper threads are included), files, bytes written and compressed
+    bytes read.
+
+    Counters may be incremented from helper threads (for example the one
+    reading the compressed tarball); listeners are only called from the
+    thread driving the update.
+    """
+
+    def __init__(self, listener=None, status_callback=None, compressed_total=0,
+                 max_hz=PROGRESS_MAX_HZ):
+        self.listener = listener
+        self.status_callback = status_callback or (lambda message: None)
+        self.compressed_total = compressed_total
+        self.compressed_read = 0
+        self.bytes_written = 0
+        self.files = 0
+        self.interval = 1.0 / max_hz
+        self.start_time = time.monotonic()
+        self.last_emit = 0.0
+        self.phase = None
+        self.phase_range = (0, 0)
+        self.phase_measure = None
+        self.phase_total = 0
+        self.phase_base = 0
+        self.pass_base = 0
+        self.pass_total = compressed_total
+        self.warnings = 0
+        self.percent = 0
+        self.phase_timings = []
+        self.phase_started = None
+
+    def start_phase(self, name, start, end, measure=None, total=0):
+        """
+        Begin a phase covering start..end percent.
+
+        measure is "compressed", "bytes" or "files" (or None for a phase
+        without measurable progress) and total the expected amount; a
+        "compressed" phase is a new pass over the tarball, by default of
+        compressed_total bytes.
+        """
+        self.finish_phase()
+        self.phase = name
+        self.phase_range = (start, end)
+        self.phase_measure = measure
+        self.phase_total = total
+        self.phase_base = self._measured()
+        if measure == "compressed":
+            self.phase_total = total or self.compressed_total
+            self.pass_base = self.phase_base
+            self.pass_total = self.phase_total
+        self.phase_started = PhaseTiming(
+            name, time.monotonic(), time.process_time(), self.files, self.bytes_written,
+            self.compressed_read,
+        )
+        self.warnings = 0
+        self.update(force=True)
+
+    def finish_phase(self):
+        """Summarise suppressed warnings of the current phase and record its timing."""
+        hidden = self.warnings - MAX_WARNINGS_PER_PHASE
+        if hidden > 0:
+            self.status_callback(f"... and {hidden} more warnings during {self.phase}")
+        self.warnings = 0
+        started = self.phase_started
+        if started:
+            self.phase_timings.append(PhaseTiming(
+                started.name,
+                time.monotonic() - started.wall,
+                time.process_time() - started.cpu,
+                self.files - started.files,
+                self.bytes_written - started.bytes_written,
+                self.compressed_read - started.compressed_read,
+            ))
+            self.phase_started = None
+
+    def _measured(self):
+        if self.phase_measure == "compressed":
+            return self.compressed_read
+        if self.phase_measure == "bytes":
+            return self.bytes_written
+        if self.phase_measure == "files":
+            return self.files
+        return 0
+
+    def add_compressed(self, count):
+        """Record compressed bytes read; may be called from any thread."""
+        self.compressed_read += count
+
+    def add_file(self, size=0):
+        """Record a processed file and the bytes written for it."""
+        self.files += 1
+        self.bytes_written += size
+        self.update()
+
+    def warn(self, message):
+        """Report a per-file problem, coalescing floods of them."""
+        self.warnings += 1
+        if self.warnings <= MAX_WARNINGS_PER_PHASE:
+            self.status_callback(message)
+
+    def snapshot(self):
+        """Return the current ProgressSnapshot."""
+        start, end = self.phase_range
+        done, total = self._measured() - self.phase_base, self.phase_total
+        fraction = min(done / total, 1.0) if total else 0.0
+        # Never move backwards, e.g. when a phase total was underestimated
+        self.percent = max(self.percent, start + (end - start) * fraction)
+        elapsed = time.monotonic() - self.start_time
+        eta = None
+        if 1.0 <= self.percent < 100:
+            eta = elapsed * (100 - self.percent) / self.percent
+        return ProgressSnapshot(
+            self.phase, self.percent, self.compressed_read - self.pass_base, self.pass_total,
+            self.bytes_written, self.files, elapsed, eta,
+        )
+
+    def update(self, force=False):
+        """Deliver a snapshot to the listener if the rate limit allows."""
+        now = time.monotonic()
+        if not force and now - self.last_emit < self.interval:
+            return
+        self.last_emit = now
+        if self.listener:
+            self.listener(self.snapshot())
+
+    def finish(self):
+        """Mark the update as complete."""
+        self.finish_phase()
+        self.phase = "done"
+        self.phase_range = (100, 100)
+        self.phase_measure = None
+        self.percent = 100
+        self.update(force=True)
+
+
+def format_progress(snapshot):
+    """Return a short human-readable description of a ProgressSnapshot."""
+    parts = []
+    if snapshot.compressed_total:
+        parts.append(
+            f"{snapshot.compressed_read / 1e6:.0f}/{snapshot.compressed_total / 1e6:.0f} MB read"
+        )
+    parts.append(f"{snapshot.bytes_written / 1e6:.0f} MB written")
+    parts.append(f"{snapshot.files} files")
+    if snapshot.eta is not None:
+        minutes, seconds = divmod(int(snapshot.eta), 60)
+        parts.append(f"ETA {minutes}:{seconds:02d}")
+    return ", ".join(parts)
+
+
+def format_bytes_written(progress):
+    """Describe the bytes a finished update wrote, in total and per phase."""
+    phases = ", ".join(
+        f"{timing.name} {timing.bytes_written / 1e6:.0f} MB"
+        for timing in progress.phase_timings if timing.bytes_written
+    )
+    total = f"{progress.bytes_written / 1e6:.0f} MB written"
+    return f"{total} ({phases})" if phases else total
+
+
+class RunRecorder:
+    """
+    Context manager appending a record of one update or rollback to the run log.
+
+    Each run becomes one JSON line in RUN_LOG_FILE with its details, the
+    outcome, total wall and CPU time and, once a ProgressTracker has been
+    attached as .progress, the PhaseTiming of every phase. A failure
+    mid-phase still records that phase. When PROFILE_ENV is set, the run is
+    profiled with cProfile (the calling thread only) and the stats are
+    written next to the run log; the record names the file. Problems
+    writing the log are ignored so they never fail an update.
+    """
+
+    def __init__(self, operation, **details):
+        self.operation = operation
+        self.details = details
+        self.progress = None
+        self.profiler = None
+
+    def __enter__(self):
+        self.started = time.time()
+        self.wall = time.monotonic()
+        self.cpu = time.process_time()
+        if os.environ.get(PROFILE_ENV):
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Another run in this process (e.g. a fleet update target) is profiled
+                self.profiler = None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record = {
+            "time": self.started,
+            "operation": self.operation,
+            **self.details,
+            "success": exc_type is None,
+            "error": str(exc) if exc is not None else None,
+            "wall": round(time.monotonic() - self.wall, 4),
+            "cpu": round(time.process_time() - self.cpu, 4),
+            "phases": [],
+        }
+        if self.progress:
+            self.progress.finish_phase()
+            record["bytes_written"] = self.progress.bytes_written
+            record["phases"] = [
+                {**timing._asdict(), "wall": round(timing.wall, 4), "cpu": round(timing.cpu, 4)}
+                for timing in self.progress.phase_timings
+            ]
+        if self.profiler:
+            self.profiler.disable()
+        try:
+            STATE_DIR.mkdir(parents=True, exist_ok=True)
+            if self.profiler:
+                profile = STATE_DIR / f"{self.operation}-{int(self.started)}.prof"
+                suffix = 1
+                while profile.exists():
+                    # Fleet updates record several runs started the same second
+                    profile = STATE_DIR / f"{self.operation}-{int(self.started)}-{suffix}.prof"
+                    suffix += 1
+                self.profiler.dump_stats(profile)
+                record["profile"] = str(profile)
+            if RUN_LOG_FILE.exists() and RUN_LOG_FILE.stat().st_size > RUN_LOG_MAX_BYTES:
+                os.replace(RUN_LOG_FILE, RUN_LOG_FILE.with_name(RUN_LOG_FILE.name + ".1"))
+            with open(RUN_LOG_FILE, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError:
+            pass
+        return False
+
+
+class CountingReader(io.RawIOBase):
+    """Raw file wrapper that reports bytes read to a ProgressTracker."""
+
+    def __init__(self, raw, progress):
+        super().__init__()
+        self.raw = raw
+        self.progress = progress
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        if count:
+            self.progress.add_compressed(count)
+        return count
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+class ThreadedGzipReader(io.RawIOBase):
+    """
+    Pure-Python gzip reader that inflates on a background thread.
+
+    zlib releases the GIL while inflating, so decompression of the next
+    chunks overlaps with tar header parsing and file writes on the consuming
+    thread. Concatenated gzip members are handled like gzip.open() does.
+    fileobj is the compressed input and is closed with the reader.
+    """
+
+    def __init__(self, fileobj, chunk_size=COPY_BUFSIZE, max_chunks=8):
+        super().__init__()
+        self._file = fileobj
+        self._chunk_size = chunk_size
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._pending = b""
+        self._stopped = threading.Event()
+        self._eof = False
+        self._thread = threading.Thread(target=self._inflate, daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _inflate(self):
+        try:
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            while not self._stopped.is_set():
+                data = self._file.read(self._chunk_size)
+                if not data:
+                    if not inflater.eof:
+                        raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+                    break
+                while True:
+                    # Bounded output, so a highly compressible chunk cannot
+                    # queue more than one chunk_size of data at a time
+                    out = inflater.decompress(data, self._chunk_size)
+                    if out:
+                        self._put(out)
+                    data = inflater.unconsumed_tail
+                    if inflater.eof and inflater.unused_data:
+                        # Start of another gzip member
+                        data = inflater.unused_data
+                        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    elif not data and len(out) < self._chunk_size:
+                        break
+            self._put(None)
+        except Exception as e:
+            self._put(e)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self._pending and not self._eof:
+            item = self._chunks.get()
+            if item is None:
+                self._eof = True
+            elif isinstance(item, Exception):
+                self._eof = True
+                raise item
+            else:
+                self._pending = memoryview(item)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stopped.set()
+            self._thread.join()
+            self._file.close()
+        super().close()
+
+
+def detect_compression(tarball_path):
+    """
+    Return the compression format of a tarball from its leading bytes.
+
+    One of "gzip", "xz", "bzip2", "zstd" or "tar" (uncompressed); raises an
+    Exception for anything else.
+    """
+    with open(tarball_path, "rb") as f:
+        header = f.read(512)
+    for magic, fmt in COMPRESSION_MAGIC:
+        if header.startswith(magic):
+            return fmt
+    if header[257:262] == b"ustar":
+        return "tar"
+    raise Exception("Unrecognised tarball format (expected gzip, xz, bzip2, zstd or plain tar)")
+
+
+def is_supported_tarball(path):
+    """Return True if path looks like a tarball this updater can read."""
+    if str(path).lower().endswith(TARBALL_SUFFIXES):
+        return True
+    try:
+        detect_compression(path)
+    except Exception:
+        return False
+    return True
+
+
+def select_decompressor(fmt="gzip"):
+    """
+    Return the name of the decompression backend to use for a format.
+
+    An external (usually multi-threaded) decompressor is preferred when one
+    is on PATH; otherwise an in-process one is used. For gzip that is the
+    threaded pure-Python reader. The choice can be forced with the
+    WINDSURF_UPDATER_DECOMPRESSOR environment variable; for formats other
+    than gzip it is only honoured if it applies to the format.
+    """
+    override = os.environ.get(DECOMPRESSOR_ENV, "").strip()
+    externals = EXTERNAL_DECOMPRESSORS.get(fmt, {})
+    if override and (fmt == "gzip" or override in externals or override in INTERNAL_DECOMPRESSORS[fmt]):
+        return override
+    for name, command in externals.items():
+        if shutil.which(command[0]):
+            return name
+    return INTERNAL_DECOMPRESSORS[fmt][0]
+
+
+class TeeReader(io.RawIOBase):
+    """
+    Raw stream wrapper that copies everything read to another file.
+
+    Writing the copy is best effort: on an OSError (e.g. a full disk) the
+    copy is closed and reading carries on.
+    """
+
+    def __init__(self, stream, copy_to):
+        super().__init__()
+        self.stream = stream
+        self.copy_to = copy_to
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.stream.readinto(buffer)
+        if count and not self.copy_to.closed:
+            try:
+                self.copy_to.write(memoryview(buffer)[:count])
+            except OSError:
+                self.copy_to.close()
+        return count
+
+
+@contextlib.contextmanager
+def open_decompressed(tarball_path, backend=None, progress=None, copy_to=None):
+    """
+    Yield a readable binary stream of the decompressed tarball contents.
+
+    The compression format is detected by detect_compression(). backend is
+    one of its EXTERNAL_DECOMPRESSORS or INTERNAL_DECOMPRESSORS names; by
+    default select_decompressor() picks one. If a ProgressTracker is given,
+    compressed bytes consumed are reported to it. If copy_to is given, the
+    complete decompressed archive is also written to that file.
+    """
+    fmt = detect_compression(tarball_path)
+    backend = backend or select_decompressor(fmt)
+    with _open_decompressed(tarball_path, fmt, backend, progress) as stream:
+        if copy_to is None:
+            yield stream
+        else:
+            with io.BufferedReader(TeeReader(stream, copy_to), COPY_BUFSIZE) as tee:
+                yield tee
+                # Copy the end-of-archive padding too, so the copy is a complete tar
+                while tee.read(COPY_BUFSIZE):
+                    pass
+
+
+@contextlib.contextmanager
+def _open_decompressed(tarball_path, fmt, backend, progress):
+    raw = open(tarball_path, "rb", buffering=0)
+    if progress:
+        raw = CountingReader(raw, progress)
+    if backend in EXTERNAL_DECOMPRESSORS.get(fmt, {}):
+        process = subprocess.Popen(
+            EXTERNAL_DECOMPRESSORS[fmt][backend],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+        def feed():
+            # Pipe the tarball in ourselves so compressed progress is visible
+            try:
+                for chunk in iter(lambda: raw.read(COPY_BUFSIZE), b""):
+                    process.stdin.write(chunk)
+            except (BrokenPipeError, ValueError):
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+        stderr_chunks = []
+
+        def drain():
+            # Collect diagnostics while stdout is read, so a decompressor
+            # writing a lot to stderr cannot fill the pipe and stall
+            for chunk in iter(lambda: process.stderr.read1(COPY_BUFSIZE), b""):
+                stderr_chunks.append(chunk)
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        drainer = threading.Thread(target=drain, daemon=True)
+        drainer.start()
+        try:
+            yield process.stdout
+            # Drain the end-of-archive padding so the decompressor is not
+            # killed by SIGPIPE and mistaken for a failure
+            while process.stdout.read(COPY_BUFSIZE):
+                pass
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+            process.wait()
+            drainer.join()
+            process.stderr.close()
+            stderr = b"".join(stderr_chunks).decode(errors="replace").strip()
+            feeder.join()
+            raw.close()
+        if process.returncode != 0:
+            raise Exception(f"{backend} failed to decompress tarball: {stderr}")
+    elif fmt == "gzip" and backend == "threaded":
+        with io.BufferedReader(ThreadedGzipReader(raw), COPY_BUFSIZE) as stream:
+            yield stream
+    elif fmt == "gzip" and backend == "gzip":
+        with raw, gzip.GzipFile(fileobj=io.BufferedReader(raw, COPY_BUFSIZE), mode="rb") as stream:
+            yield stream
+    elif fmt in ("xz", "bzip2") and backend == "python":
+        module = lzma if fmt == "xz" else bz2
+        with raw, module.open(io.BufferedReader(raw, COPY_BUFSIZE), "rb") as stream:
+            yield stream
+    elif fmt == "zstd" and backend == "python":
+        if zstandard is None:
+            raw.close()
+            raise Exception("zstd tarballs need the zstd command or the zstandard Python package")
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_size=COPY_BUFSIZE)
+        with io.BufferedReader(reader, COPY_BUFSIZE) as stream:
+            yield stream
+    elif fmt == "tar" and backend == "plain":
+        with io.BufferedReader(raw, COPY_BUFSIZE) as stream:
+            yield stream
+    else:
+        raw.close()
+        raise Exception(f"Unknown decompression backend for {fmt} tarballs: {backend}")
+
+
+class RepackCache:
+    """
+    Uncompressed copies of recently applied tarballs.
+
+    Applying the same tarball again (a rollback, or one installation after
+    another) then reads a plain tar at disk speed instead of inflating it.
+    Copies are named after the tarball's path, size and mtime, so a changed
+    tarball never matches a stale copy, and only the keep most recently
+    used ones are kept. Filled during extraction when the "repack_cache"
+    setting is enabled.
+    """
+
+    def __init__(self, root=None, keep=REPACK_CACHE_KEEP):
+        self.root = Path(root) if root else REPACK_CACHE_DIR
+        self.keep = keep
+
+    def entry_path(self, tarball_path):
+        """Return where the uncompressed copy of a tarball is stored."""
+        st = os.stat(tarball_path)
+        key = hashlib.blake2b(os.path.realpath(tarball_path).encode(), digest_size=8).hexdigest()
+        return self.root / f"{key}-{st.st_size}-{st.st_mtime_ns}.tar"
+
+    def lookup(self, tarball_path):
+        """Return the uncompressed copy of a tarball as a string, or None."""
+        path = self.entry_path(tarball_path)
+        try:
+            # The mtime records when the copy was last used
+            os.utime(path)
+        except OSError:
+            return None
+        return str(path)
+
+    @contextlib.contextmanager
+    def writer(self, tarball_path, enabled=True):
+        """
+        Yield a file to write the decompressed tarball to, or None if not enabled.
+
+        The copy is added to the cache only if the block succeeds and every
+        write went through.
+        """
+        if not enabled:
+            yield None
+            return
+        path = self.entry_path(tarball_path)
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=self.root, suffix=".partial")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                yield f
+                # TeeReader closes the file if a write failed
+                complete = not f.closed
+            if complete:
+                os.replace(temp, path)
+        finally:
+            if os.path.exists(temp):
+                os.unlink(temp)
+        self.prune()
+
+    def prune(self):
+        """Remove all but the most recently used copies."""
+        copies = sorted(self.root.glob("*.tar"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for old in copies[self.keep:]:
+            old.unlink()
+
+
+def is_safe_member_path(name):
+    """Return True if a tarball member name stays inside the extraction directory."""
+    return not (name.startswith('/') or '..' in name)
+
+
+def archive_root(name):
+    """Return the top-level directory prefix of a member name, or ''."""
+    head, sep, _ = name.partition("/")
+    return head + "/" if sep else ""
+
+
+def tarball_root(first_member):
+    """Return the root directory prefix of a tarball from its first member, or ''."""
+    name = first_member.name.rstrip("/")
+    return archive_root(name) or (name + "/" if first_member.isdir() else "")
+
+
+def iter_members(tar):
+    """
+    Yield the members of a stream-mode TarFile without keeping them.
+
+    TarFile records every member it reads in tar.members, which for a large
+    archive holds more memory than anything else during extraction. The
+    list is emptied as each member is handed out; members can still be
+    extracted, and hardlinks resolved against files already on disk.
+    """
+    for member in tar:
+        yield member
+        tar.members.clear()
+
+
+class MemberValidator:
+    """
+    Reject tarball members that would write outside the installation.
+
+    Member names must be relative without "..". Symlink and hardlink
+    targets must also stay inside the extraction directory and, for
+    members below the tarball's root directory (which becomes the
+    installation), inside that root. Targets are resolved through the
+    symlinks seen earlier in the archive, as tarfile's "data" filter does
+    with realpath(), and no member may be written through one of those
+    symlinks or replace one. Members must be checked in archive order,
+    since the first one determines the root. Only symlinks are remembered,
+    so memory use grows with their number, not the archive's.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.links = {}
+        self.root_shared = True
+
+    @property
+    def common_root(self):
+        """The root, or "" if some member checked so far lies outside it."""
+        return self.root if self.root and self.root_shared else ""
+
+    def check(self, member):
+        """Raise an Exception if member is unsafe to extract."""
+        if not is_safe_member_path(member.name):
+            raise Exception(f"Potentially unsafe path in tarball: {member.name}")
+        name = member.name.rstrip("/")
+        if self.root is None:
+            self.root = tarball_root(member)
+        if not (name + "/").startswith(self.root):
+            self.root_shared = False
+        path = os.path.normpath(name)
+        parent = os.path.dirname(path)
+        while parent:
+            if parent in self.links:
+                raise Exception(f"Potentially unsafe path in tarball (through a link): {member.name}")
+            parent = os.path.dirname(parent)
+        if path in self.links and not member.issym():
+            raise Exception(f"Potentially unsafe path in tarball (replaces a link): {member.name}")
+        if member.issym():
+            target = None if os.path.isabs(member.linkname) else \
+                self.resolve(os.path.join(os.path.dirname(path), member.linkname))
+        elif member.islnk():
+            target = None if os.path.isabs(member.linkname) else self.resolve(member.linkname)
+        else:
+            return
+        if target is None or (self.inside_root(path) and not self.inside_root(target)):
+            raise Exception(f"Potentially unsafe link in tarball: {member.name} -> {member.linkname}")
+        if member.issym():
+            self.links[path] = member.linkname
+
+    def inside_root(self, path):
+        """Return True if the normalised path is the tarball's root or below it."""
+        root = os.path.normpath(self.root) if self.root else "."
+        return root == "." or path == root or path.startswith(root + "/")
+
+    def resolve(self, path):
+        """
+        Return path with the symlinks seen so far followed, normalised.
+
+        Returns None if the path leaves the extraction directory or the
+        links loop.
+        """
+        parts = []
+        pending = path.split("/")[::-1]
+        hops = 0
+        while pending:
+            part = pending.pop()
+            if part in ("", "."):
+                continue
+            if part == "..":
+                if not parts:
+                    return None
+                parts.pop()
+                continue
+            link = self.links.get("/".join(parts + [part]))
+            if link is None:
+                parts.append(part)
+                continue
+            hops += 1
+            if hops > MAX_LINK_HOPS or os.path.isabs(link):
+                return None
+            pending.extend(link.split("/")[::-1])
+        return "/".join(parts)
+
+
+def normalize_member_mode(member):
+    """
+    Give a tarball member the permissions of a system-wide installation.
+
+    Directories and executables become 755 and everything else 644, so a
+    privileged update does not need a separate chmod pass over the tree.
+    Shell scripts are treated as executable even if the tarball lost the bit.
+    """
+    if member.isdir() or member.mode & 0o111 or member.name.endswith(".sh"):
+        member.mode = 0o755
+    else:
+        member.mode = 0o644
+
+
+def ensure_parent(target, created_dirs):
+    """Create the parent directory of target unless created_dirs has it."""
+    parent = os.path.dirname(target)
+    if parent not in created_dirs:
+        os.makedirs(parent, exist_ok=True)
+        created_dirs.add(parent)
+
+
+class WriterPool:
+    """
+    Bounded pool of threads writing extracted files.
+
+    The thread reading the tar stream hands over complete files (data,
+    mode and mtime) and moves on to the next member while the writers do
+    the open/write/chmod/utime syscalls. Files are queued in batches of
+    WRITE_BATCH_FILES or WRITE_BATCH_BYTES. submit() blocks while max_bytes
+    of file data are queued, so memory stays bounded however large the
+    archive is. Write errors are collected and returned by drain().
+    """
+
+    def __init__(self, workers=EXTRACT_WORKERS, max_bytes=WRITE_QUEUE_BYTES):
+        import concurrent.futures
+
+        self.max_bytes = max_bytes
+        self.queued_bytes = 0
+        self.outstanding = 0
+        self.errors = []
+        self.batch = []
+        self.batch_bytes = 0
+        self.condition = threading.Condition()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="windsurf-writer"
+        )
+
+    def submit(self, name, target, data, mode, mtime):
+        """Queue a file to be written, waiting for room if the queue is full."""
+        self.batch.append((name, target, data, mode, mtime))
+        self.batch_bytes += max(len(data), WRITE_QUEUE_MIN_CHARGE)
+        if len(self.batch) >= WRITE_BATCH_FILES or self.batch_bytes >= WRITE_BATCH_BYTES:
+            self.flush()
+
+    def flush(self):
+        """Hand the current batch to the writers."""
+        if not self.batch:
+            return
+        batch, charge = self.batch, self.batch_bytes
+        self.batch, self.batch_bytes = [], 0
+        with self.condition:
+            while self.queued_bytes and self.queued_bytes + charge > self.max_bytes:
+                self.condition.wait()
+            self.queued_bytes += charge
+            self.outstanding += 1
+        self.executor.submit(self._write, batch, charge)
+
+    def _write(self, batch, charge):
+        errors = []
+        for name, target, data, mode, mtime in batch:
+            try:
+                with open(target, "wb") as f:
+                    f.write(data)
+                os.chmod(target, mode)
+                os.utime(target, (mtime, mtime))
+            except Exception as e:
+                errors.append((name, e))
+        with self.condition:
+            self.errors.extend(errors)
+            self.queued_bytes -= charge
+            self.outstanding -= 1
+            self.condition.notify_all()
+
+    def drain(self):
+        """Wait until every queued file is written; return and clear the errors."""
+        self.flush()
+        with self.condition:
+            while self.outstanding:
+                self.condition.wait()
+            errors, self.errors = self.errors, []
+        return errors
+
+    def close(self):
+        """Wait for the writers and stop them."""
+        self.executor.shutdown(wait=True)
+
+
+def write_member(tar, member, dest_dir, created_dirs, hasher=None):
+    """
+    Write a single tarball member below dest_dir.
+
+    Regular files and directories are written directly, which skips most of
+    the per-member bookkeeping done by TarFile.extract(); links and special
+    files still go through TarFile.extract(). Parent directories are created
+    on demand and remembered in created_dirs. The data of a regular file is
+    also fed to hasher, if given.
+    """
+    target = os.path.join(dest_dir, member.name)
+    if member.isdir():
+        if target not in created_dirs:
+            os.makedirs(target, exist_ok=True)
+            created_dirs.add(target)
+        return
+
+    ensure_parent(target, created_dirs)
+
+    if member.isreg():
+        source = tar.extractfile(member)
+        with open(target, "wb") as f:
+            if hasher:
+                for chunk in iter(lambda: source.read(COPY_BUFSIZE), b""):
+                    hasher.update(chunk)
+                    f.write(chunk)
+            elif member.size <= COPY_BUFSIZE:
+                f.write(source.read())
+            else:
+                shutil.copyfileobj(source, f, COPY_BUFSIZE)
+        os.chmod(target, member.mode & 0o7777)
+        os.utime(target, (member.mtime, member.mtime))
+    else:
+        tar.extract(member, path=dest_dir, set_attrs=not member.issym())
+
+
+def stream_extract(tarball_path, dest_dir, status_callback=None, backend=None, progress=None,
+                   normalize_permissions=False, index_entries=None, copy_to=None,
+                   workers=EXTRACT_WORKERS):
+    """
+    Extract a (compressed) tarball into dest_dir in a single pass.
+
+    The archive is decompressed by open_decompressed() and read in stream
+    mode ("r|") so there is no separate index pass: each member is checked
+    by a MemberValidator as it is read. With more than one worker, regular
+    files are read into memory and handed to a WriterPool so their syscalls
+    overlap with reading the next members; files larger than the pool's
+    queue, directories and links are written on the reading thread. If
+    index_entries is a list, an IndexEntry for every member is appended to
+    it, so a TarballIndex can be built without decompressing again.
+    Directory permissions are applied at the end so read-only directories do
+    not block their contents. Per-member permission or I/O errors are
+    reported through status_callback and skipped, matching the previous
+    behaviour; an unsafe path aborts the extraction. Progress is reported to
+    the optional ProgressTracker. With normalize_permissions, members are
+    written with normalize_member_mode() permissions. copy_to is passed to
+    open_decompressed().
+
+    Returns the tarball's root directory prefix (MemberValidator.common_root),
+    or "" when its members do not share one.
+    """
+    dest_dir = str(dest_dir)
+    created_dirs = {dest_dir}
+    directories = []
+    validator = MemberValidator()
+    pool = WriterPool(workers) if workers > 1 else None
+    failed = set()
+
+    def report_error(name, error):
+        failed.add(name)
+        if not status_callback:
+            return
+        if isinstance(error, PermissionError):
+            status_callback(f"Permission error extracting {name}, trying to continue...")
+        else:
+            status_callback(f"Error extracting {name}: {str(error)}")
+
+    try:
+        with open_decompressed(tarball_path, backend, progress, copy_to) as stream, \
+                tarfile.open(fileobj=stream, mode="r|") as tar:
+            for member in iter_members(tar):
+                validator.check(member)
+                entry = hasher = None
+                if index_entries is not None:
+                    # Recorded before normalize_member_mode(), as shipped
+                    entry = index_entry(member)
+                    hasher = new_hasher() if member.isreg() else None
+                if normalize_permissions:
+                    normalize_member_mode(member)
+                try:
+                    if pool and member.isreg() and member.size <= pool.max_bytes:
+                        data = tar.extractfile(member).read()
+                        if hasher:
+                            hasher.update(data)
+                        target = os.path.join(dest_dir, member.name)
+                        ensure_parent(target, created_dirs)
+                        pool.submit(member.name, target, data, member.mode & 0o7777, member.mtime)
+                    else:
+                        if pool and member.islnk():
+                            # The link target has to be on disk first
+                            for name, error in pool.drain():
+                                report_error(name, error)
+                        write_member(tar, member, dest_dir, created_dirs, hasher)
+                    if hasher:
+                        entry = entry._replace(digest=hasher.hexdigest())
+                    if member.isdir():
+                        directories.append((member.name, member.mode, member.mtime))
+                    if progress:
+                        progress.add_file(member.size if member.isreg() else 0)
+                except Exception as e:
+                    report_error(member.name, e)
+                finally:
+                    # A file that failed to extract is indexed without a digest
+                    if entry:
+                        index_entries.append(entry)
+        if pool:
+            for name, error in pool.drain():
+                report_error(name, error)
+    finally:
+        if pool:
+            pool.close()
+
+    if failed and index_entries is not None:
+        index_entries[:] = [e._replace(digest=None) if e.name in failed else e for e in index_entries]
+
+    # Apply directory attributes deepest first, as TarFile.extractall() does
+    for name, mode, mtime in sorted(directories, reverse=True):
+        target = os.path.join(dest_dir, name)
+        try:
+            os.chmod(target, mode & 0o7777)
+            os.utime(target, (mtime, mtime))
+        except OSError as e:
+            if status_callback:
+                status_callback(f"Could not set attributes on {name}: {str(e)}")
+    return validator.common_root
+
+
+ManifestEntry = namedtuple(
+    "ManifestEntry", ["kind", "size", "mtime_ns", "mode", "dev", "ino", "digest"]
+)
+
+# Name of the manifest hash, stored in the cache so a change invalidates it
+HASH_NAME = "blake2b-128"
+
+
+def new_hasher():
+    """Return the hash object used for file manifests."""
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_file(path):
+    """Return the manifest hash of the file at path."""
+    hasher = new_hasher()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_BUFSIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ManifestCache:
+    """
+    On-disk cache of file hashes keyed by (device, inode, size, mtime_ns).
+
+    A file whose stat key is unchanged since it was last hashed is assumed
+    to have the same contents, so rescanning an installation or a backup
+    only costs a stat() per file. Any write through the usual tools changes
+    the size or mtime and therefore misses the cache. The whole cache is
+    discarded when its schema or hash function changes, entries unused for
+    MANIFEST_CACHE_MAX_AGE_DAYS are dropped, and at most max_entries are
+    kept, evicting the least recently used.
+
+    The connection belongs to the thread that created the cache.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path=None, max_entries=MANIFEST_CACHE_MAX_ENTRIES):
+        self.path = Path(path) if path else CACHE_DIR / "manifest.sqlite3"
+        self.max_entries = max_entries
+        self.now = int(time.time())
+        self._touched = []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self.db = self._connect()
+        except sqlite3.DatabaseError:
+            # Corrupt cache: start over
+            self.path.unlink()
+            self.db = self._connect()
+
+    def _connect(self):
+        db = sqlite3.connect(str(self.path))
+        version = db.execute("PRAGMA user_version").fetchone()[0]
+        row = None
+        if version == self.SCHEMA_VERSION:
+            row = db.execute("SELECT value FROM meta WHERE key = 'hash'").fetchone()
+        if row is None or row[0] != HASH_NAME:
+            db.executescript(
+                "DROP TABLE IF EXISTS meta;"
+                "DROP TABLE IF EXISTS hashes;"
+                "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);"
+                "CREATE TABLE hashes ("
+                "  dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,"
+                "  digest TEXT NOT NULL, last_used INTEGER NOT NULL,"
+                "  PRIMARY KEY (dev, ino, size, mtime_ns));"
+                "CREATE INDEX hashes_last_used ON hashes (last_used);"
+            )
+            db.execute("INSERT INTO meta VALUES ('hash', ?)", (HASH_NAME,))
+            db.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            db.commit()
+        return db
+
+    def lookup(self, dev, ino, size, mtime_ns):
+        """Return the cached hash for a stat key, or None."""
+        row = self.db.execute(
+            "SELECT digest FROM hashes WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+            (dev, ino, size, mtime_ns),
+        ).fetchone()
+        if row is None:
+            return None
+        self._touched.append((self.now, dev, ino, size, mtime_ns))
+        return row[0]
+
+    def store(self, dev, ino, size, mtime_ns, digest):
+        """Record the hash of a file. Replaces any entry for a reused inode."""
+        self.db.execute("DELETE FROM hashes WHERE dev = ? AND ino = ?", (dev, ino))
+        self.db.execute(
+            "INSERT INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+            (dev, ino, size, mtime_ns, digest, self.now),
+        )
+
+    def digest(self, path, st=None):
+        """Return the hash of the file at path, using the cache when possible."""
+        st = st or os.stat(path)
+        key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        digest = self.lookup(*key)
+        if digest is None:
+            digest = hash_file(path)
+            self.store(*key, digest)
+        return digest
+
+    def prune(self):
+        """Apply the age and size limits."""
+        self.db.execute(
+            "DELETE FROM hashes WHERE last_used < ?",
+            (self.now - MANIFEST_CACHE_MAX_AGE_DAYS * 86400,),
+        )
+        count = self.db.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        if count > self.max_entries:
+            self.db.execute(
+                "DELETE FROM hashes WHERE rowid IN ("
+                "  SELECT rowid FROM hashes ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def close(self):
+        """Record cache hits, enforce the limits and write everything to disk."""
+        if self._touched:
+            self.db.executemany(
+                "UPDATE hashes SET last_used = ? WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                self._touched,
+            )
+            self._touched = []
+        self.prune()
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_manifest_cache(status_callback=None):
+    """Open the default ManifestCache, or return None if it is unavailable."""
+    try:
+        return ManifestCache()
+    except (OSError, sqlite3.Error) as e:
+        if status_callback:
+            status_callback(f"Warning: Hash cache unavailable, hashing every file: {str(e)}")
+        return None
+
+
+def scan_tree(root):
+    """
+    Yield an os.DirEntry for every path below root, parents before children.
+
+    Directories are listed one at a time with os.scandir() and symlinks are
+    not followed, so memory use does not grow with the size of the tree.
+    Unreadable directories are skipped, as os.walk() does.
+    """
+    pending = [str(root)]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                yield entry
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+
+
+def build_manifest(root, cache=None, with_digests=False):
+    """
+    Describe the installation tree below root.
+
+    Returns a dict mapping each relative path to a ManifestEntry. By default
+    hashes are not computed here (digest is None); use entry_digest() to get
+    them on demand, since most files can be told apart by size alone. With
+    with_digests every file is hashed, through cache if one is given.
+    """
+    manifest = {}
+    root = str(root)
+    prefix = os.path.join(root, "")
+    for entry in scan_tree(root):
+        st = entry.stat(follow_symlinks=False)
+        if entry.is_symlink():
+            kind = "symlink"
+        elif entry.is_dir(follow_symlinks=False):
+            kind = "dir"
+        else:
+            kind = "file"
+        rel = entry.path[len(prefix):]
+        manifest[rel] = ManifestEntry(
+            kind, st.st_size, st.st_mtime_ns, st.st_mode & 0o7777, st.st_dev, st.st_ino, None
+        )
+        if with_digests and kind == "file":
+            entry_digest(root, rel, manifest, cache)
+    return manifest
+
+
+def entry_digest(root, rel, manifest, cache=None):
+    """Return the hash of a manifest file entry, computing it if needed."""
+    entry = manifest[rel]
+    if entry.digest is None:
+        path = os.path.join(root, rel)
+        digest = None
+        if cache:
+            digest = cache.lookup(entry.dev, entry.ino, entry.size, entry.mtime_ns)
+        if digest is None:
+            digest = hash_file(path)
+            if cache:
+                cache.store(entry.dev, entry.ino, entry.size, entry.mtime_ns, digest)
+        entry = entry._replace(digest=digest)
+        manifest[rel] = entry
+    return entry.digest
+
+
+IndexEntry = namedtuple(
+    "IndexEntry", ["name", "kind", "size", "mode", "mtime", "linkname", "offset", "digest"]
+)
+
+
+def member_kind(member):
+    """Return the manifest kind of a tarball member."""
+    if member.isreg():
+        return "file"
+    if member.isdir():
+        return "dir"
+    if member.issym():
+        return "symlink"
+    if member.islnk():
+        return "hardlink"
+    return "other"
+
+
+def index_entry(member, digest=None):
+    """Return the IndexEntry for a tarball member (read in stream mode)."""
+    return IndexEntry(
+        member.name, member_kind(member), member.size, member.mode & 0o7777,
+        int(member.mtime), member.linkname, member.offset_data, digest,
+    )
+
+
+class TarballIndex:
+    """
+    Member index of a release tarball.
+
+    Records each member's name, kind, size, mode, mtime, link target, data
+    offset in the uncompressed archive and content hash (HASH_NAME, so it
+    can be compared with installation manifests directly). Every member has
+    been checked by a MemberValidator. The index is saved as a JSON sidecar
+    under TARBALL_INDEX_DIR, keyed by the tarball's path and checked against
+    its size and mtime, so the archive is only decompressed for this once.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.by_name = {entry.name.rstrip("/"): entry for entry in entries}
+        self.files = sum(1 for entry in entries if entry.kind == "file")
+        self.total_size = sum(entry.size for entry in entries if entry.kind == "file")
+        # Digests are missing for files that failed to extract while indexing
+        self.complete = all(entry.digest for entry in entries if entry.kind == "file")
+
+    def tarinfos(self):
+        """Yield a TarInfo for every member, in archive order (without data)."""
+        types = {
+            "file": tarfile.REGTYPE, "dir": tarfile.DIRTYPE,
+            "symlink": tarfile.SYMTYPE, "hardlink": tarfile.LNKTYPE,
+        }
+        for entry in self.entries:
+            member = tarfile.TarInfo(entry.name)
+            member.type = types[entry.kind]
+            member.size = entry.size
+            member.mode = entry.mode
+            member.mtime = entry.mtime
+            member.linkname = entry.linkname
+            yield member
+
+    @staticmethod
+    def sidecar_path(tarball_path):
+        """Return the sidecar file for the tarball at tarball_path."""
+        key = hashlib.blake2b(os.path.realpath(tarball_path).encode(), digest_size=8).hexdigest()
+        return TARBALL_INDEX_DIR / f"{key}.json"
+
+    @classmethod
+    def load(cls, tarball_path):
+        """Return the saved index of a tarball, or None if missing or stale."""
+        try:
+            st = os.stat(tarball_path)
+            with open(cls.sidecar_path(tarball_path)) as f:
+                data = json.load(f)
+            if (data["format"], data["hash"], data["size"], data["mtime_ns"]) != (
+                    TARBALL_INDEX_FORMAT, HASH_NAME, st.st_size, st.st_mtime_ns):
+                return None
+            return cls([IndexEntry(*entry) for entry in data["entries"]])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, tarball_path):
+        """Write the index sidecar, keeping only the most recent ones."""
+        if not self.complete:
+            return
+        path = self.sidecar_path(tarball_path)
+        st = os.stat(tarball_path)
+        data = {
+            "format": TARBALL_INDEX_FORMAT, "hash": HASH_NAME,
+            "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "entries": [list(entry) for entry in self.entries],
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp = path.with_name(path.name + ".tmp")
+            with open(temp, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temp, path)
+            sidecars = sorted(path.parent.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+            for old in sidecars[TARBALL_INDEX_KEEP:]:
+                old.unlink()
+        except OSError:
+            # The index is only a cache
+            pass
+
+
+def index_tarball(tarball_path, backend=None, progress=None, source_path=None, copy_to=None):
+    """
+    Return the TarballIndex of a tarball, building and saving it if needed.
+
+    Building decompresses the archive once without extracting anything;
+    an unsafe member raises an Exception before any file is written. The
+    archive is read from source_path (e.g. a RepackCache copy) if given.
+    copy_to is passed to open_decompressed().
+    """
+    index = TarballIndex.load(tarball_path)
+    if index is not None:
+        return index
+    entries = []
+    validator = MemberValidator()
+    with open_decompressed(source_path or tarball_path, backend, progress, copy_to) as stream, \
+            tarfile.open(fileobj=stream, mode="r|") as tar:
+        for member in iter_members(tar):
+            validator.check(member)
+            digest = None
+            if member.isreg():
+                hasher = new_hasher()
+                source = tar.extractfile(member)
+                for chunk in iter(lambda: source.read(COPY_BUFSIZE), b""):
+                    hasher.update(chunk)
+                digest = hasher.hexdigest()
+            entries.append(index_entry(member, digest))
+            if progress:
+                progress.add_file(member.size if member.isreg() else 0)
+    if not entries:
+        raise Exception("No files found in the tarball")
+    index = TarballIndex(entries)
+    index.save(tarball_path)
+    return index
+
+
+def verify_tarball(tarball_path, backend=None, progress=None, copy_to=None):
+    """
+    Check every member of a tarball with a MemberValidator.
+
+    The low-memory counterpart of index_tarball(): nothing is hashed or
+    kept, so memory use does not grow with the archive. Returns the number
+    of regular files; raises an Exception for an unsafe or empty tarball.
+    copy_to is passed to open_decompressed().
+    """
+    files = members = 0
+    validator = MemberValidator()
+    with open_decompressed(tarball_path, backend, progress, copy_to) as stream, \
+            tarfile.open(fileobj=stream, mode="r|") as tar:
+        for member in iter_members(tar):
+            validator.check(member)
+            members += 1
+            files += member.isreg()
+            if progress:
+                progress.update()
+    if not members:
+        raise Exception("No files found in the tarball")
+    return files
+
+
+def remove_path(path):
+    """Remove a file, symlink or directory tree. Returns False if it did not exist."""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.unlink(path)
+    else:
+        return False
+    return True
+
+
+def write_partial(target, chunks, member):
+    """Write chunks to a partial file next to target and return its path."""
+    partial = os.path.join(os.path.dirname(target), "." + os.path.basename(target) + PARTIAL_SUFFIX)
+    with open(partial, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.chmod(partial, member.mode & 0o7777)
+    os.utime(partial, (member.mtime, member.mtime))
+    return partial
+
+
+def delta_update(tarball_path, install_path, status_callback=None, backend=None, progress=None,
+                 normalize_permissions=False, index=None, buffer_limit=DELTA_BUFFER_LIMIT):
+    """
+    Update install_path in place, writing only files that changed.
+
+    The tarball is streamed once. Each member is compared with a manifest of
+    the current installation: files with a different size or type are
+    rewritten, same-size files are compared by hash, and unchanged files are
+    left untouched. Changed files are written to a partial file and renamed
+    over the old one, so existing inodes are never modified in place. Paths
+    that are no longer in the tarball are removed.
+
+    Hashes of installed files come from the persistent ManifestCache, and
+    the hashes of newly written files are added to it, so the next update
+    only has to stat the installation. normalize_permissions is handled as
+    in stream_extract().
+
+    With the tarball's TarballIndex, files are compared using the indexed
+    hashes without reading their data, and when no file needs rewriting
+    the archive is not decompressed at all.
+
+    Same-size files up to buffer_limit bytes are read into memory to be
+    compared before anything is written; larger ones are written to their
+    partial file as they are hashed.
+
+    Returns a dict with counts of written, unchanged and removed paths and
+    the number of bytes written.
+    """
+    cache = open_manifest_cache(status_callback)
+    try:
+        return _delta_update(
+            tarball_path, str(install_path), cache, status_callback, backend, progress,
+            normalize_permissions, index, buffer_limit,
+        )
+    finally:
+        if cache:
+            cache.close()
+
+
+def _delta_update(tarball_path, install_path, cache, status_callback, backend, progress,
+                  normalize_permissions, index, buffer_limit):
+    manifest = build_manifest(install_path)
+    stats = {"written": 0, "unchanged": 0, "removed": 0, "bytes_written": 0}
+    seen = set()
+    directories = []
+    root = None
+    validator = MemberValidator()
+    real_dirs = set()
+
+    def check_ancestors(rel):
+        # A directory of the installation replaced by a symlink must not be
+        # written or created through, wherever it points; checked before
+        # anything below it is created
+        ancestors = []
+        parent = os.path.dirname(rel)
+        while parent and parent not in real_dirs:
+            ancestors.append(parent)
+            parent = os.path.dirname(parent)
+        for ancestor in reversed(ancestors):
+            path = os.path.join(install_path, ancestor)
+            if os.path.islink(path):
+                raise Exception(f"{ancestor} is a symlink in the installation")
+            if not os.path.isdir(path):
+                # Missing, so nothing below it exists yet
+                return
+            real_dirs.add(ancestor)
+
+    def same_shape(member, rel):
+        existing = manifest.get(rel)
+        return (
+            existing is not None
+            and existing.kind == "file"
+            and existing.size == member.size
+            and existing.mode == member.mode & 0o7777
+        )
+
+    def indexed_unchanged(member, rel):
+        return (
+            same_shape(member, rel)
+            and index.by_name[member.name.rstrip("/")].digest == entry_digest(install_path, rel, manifest, cache)
+        )
+
+    def needs_archive():
+        # Only file data (and special files) has to come from the archive
+        index_root = tarball_root(next(index.tarinfos()))
+        for member in index.tarinfos():
+            name = member.name.rstrip("/")
+            if not member.isreg() or not name.startswith(index_root):
+                continue
+            if normalize_permissions:
+                normalize_member_mode(member)
+            if not indexed_unchanged(member, name[len(index_root):]):
+                return True
+        return False
+
+    with contextlib.ExitStack() as stack:
+        if index is not None and not any(e.kind == "other" for e in index.entries) and not needs_archive():
+            tar = None
+            members = index.tarinfos()
+        else:
+            stream = stack.enter_context(open_decompressed(tarball_path, backend, progress))
+            tar = stack.enter_context(tarfile.open(fileobj=stream, mode="r|"))
+            members = iter_members(tar)
+        for member in members:
+            validator.check(member)
+            if progress:
+                progress.update()
+            if normalize_permissions:
+                normalize_member_mode(member)
+
+            # The tarball's first member determines its nested root directory
+            name = member.name.rstrip("/")
+            root = validator.root
+            if root and name + "/" == root:
+                continue
+            if not name.startswith(root):
+                if status_callback:
+                    status_callback(f"Skipping {member.name}: outside the tarball root")
+                continue
+            rel = name[len(root):]
+            # Parent directories are not always listed as members of their own
+            parent = rel
+            while parent and parent not in seen:
+                seen.add(parent)
+                parent = os.path.dirname(parent)
+            target = os.path.join(install_path, rel)
+            existing = manifest.get(rel)
+
+            try:
+                check_ancestors(rel)
+                if member.isdir():
+                    if existing and existing.kind != "dir":
+                        remove_path(target)
+                    os.makedirs(target, exist_ok=True)
+                    directories.append((rel, member.mode, member.mtime))
+                    continue
+
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+
+                if member.isreg():
+                    if index is not None:
+                        # The indexed hash settles it without reading the data
+                        if indexed_unchanged(member, rel):
+                            stats["unchanged"] += 1
+                            continue
+                        source = tar.extractfile(member)
+                        digest = index.by_name[name].digest
+                        partial = write_partial(target, iter(lambda: source.read(COPY_BUFSIZE), b""), member)
+                    elif same_shape(member, rel) and member.size <= buffer_limit:
+                        source = tar.extractfile(member)
+                        data = source.read()
+                        hasher = new_hasher()
+                        hasher.update(data)
+                        digest = hasher.hexdigest()
+                        if digest == entry_digest(install_path, rel, manifest, cache):
+                            stats["unchanged"] += 1
+                            continue
+                        partial = write_partial(target, [data], member)
+                    else:
+                        source = tar.extractfile(member)
+                        hasher = new_hasher()
+
+                        def chunks():
+                            for chunk in iter(lambda: source.read(COPY_BUFSIZE), b""):
+                                hasher.update(chunk)
+                                yield chunk
+
+                        partial = write_partial(target, chunks(), member)
+                        digest = hasher.hexdigest()
+                        if same_shape(member, rel) and digest == entry_digest(install_path, rel, manifest, cache):
+                            os.unlink(partial)
+                            stats["unchanged"] += 1
+                            continue
+                    if existing and existing.kind == "dir":
+                        remove_path(target)
+                    os.replace(partial, target)
+                    if cache:
+                        st = os.stat(target)
+                        cache.store(st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, digest)
+                    stats["written"] += 1
+                    stats["bytes_written"] += member.size
+                    if progress:
+                        progress.add_file(member.size)
+
+                elif member.issym():
+                    if existing and existing.kind == "symlink" and os.readlink(target) == member.linkname:
+                        stats["unchanged"] += 1
+                        continue
+                    remove_path(target)
+                    os.symlink(member.linkname, target)
+                    stats["written"] += 1
+
+                elif member.islnk():
+                    link_rel = member.linkname[len(root):] if member.linkname.startswith(root) else member.linkname
+                    remove_path(target)
+                    os.link(os.path.join(install_path, link_rel), target)
+                    stats["written"] += 1
+
+                else:
+                    remove_path(target)
+                    member.name = rel
+                    tar.extract(member, path=install_path)
+                    stats["written"] += 1
+            except PermissionError:
+                if status_callback:
+                    status_callback(f"Permission error updating {rel}, trying to continue...")
+            except Exception as e:
+                if status_callback:
+                    status_callback(f"Error updating {rel}: {str(e)}")
+
+    if root is None:
+        raise Exception("No files found in the tarball")
+
+    # Remove paths that are no longer shipped, deepest first
+    for rel in sorted(set(manifest) - seen, key=lambda r: r.count(os.sep), reverse=True):
+        try:
+            if remove_path(os.path.join(install_path, rel)):
+                stats["removed"] += 1
+        except OSError as e:
+            if status_callback:
+                status_callback(f"Could not remove {rel}: {str(e)}")
+
+    for rel, mode, mtime in sorted(directories, reverse=True):
+        target = os.path.join(install_path, rel)
+        if os.path.islink(target):
+            # chmod() would follow it
+            continue
+        try:
+            os.chmod(target, mode & 0o7777)
+            os.utime(target, (mtime, mtime))
+        except OSError as e:
+            if status_callback:
+                status_callback(f"Could not set attributes on {rel}: {str(e)}")
+
+    return stats
+
+
+def clone_file(src, dst):
+    """Create dst as a reflink copy of src sharing the same data blocks."""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    shutil.copystat(src, dst)
+
+
+# Errors meaning a kernel-side copy method cannot be used for a pair of files
+KERNEL_COPY_ERRNOS = {
+    errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF,
+}
+
+
+def kernel_copy(fsrc, fdst, size):
+    """
+    Copy size bytes between two open files without passing them through Python.
+
+    copy_file_range() is tried first (it can reflink or copy server-side on
+    filesystems that support it), then sendfile(), then a plain buffered
+    copy. Returns the number of bytes copied.
+    """
+    infd, outfd = fsrc.fileno(), fdst.fileno()
+    copied = 0
+    methods = [
+        lambda count: os.copy_file_range(infd, outfd, count, copied, copied),
+        lambda count: os.sendfile(outfd, infd, copied, count),
+    ]
+    if not hasattr(os, "copy_file_range"):
+        methods.pop(0)
+    for method in methods:
+        try:
+            while copied < size:
+                sent = method(min(size - copied, 64 * COPY_BUFSIZE))
+                if not sent:
+                    break
+                copied += sent
+            return copied
+        except OSError as e:
+            if e.errno not in KERNEL_COPY_ERRNOS or copied:
+                raise
+    shutil.copyfileobj(fsrc, fdst, COPY_BUFSIZE)
+    return fdst.tell()
+
+
+def copy_file(src, dst):
+    """Copy src to dst with its metadata; return the bytes written."""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        copied = kernel_copy(fsrc, fdst, os.fstat(fsrc.fileno()).st_size)
+    shutil.copystat(src, dst)
+    return copied
+
+
+SNAPSHOT_FILE_OPS = {
+    "reflink": clone_file,
+    "hardlink": os.link,
+    "copy": copy_file,
+}
+
+# Errors meaning a strategy is not supported between two locations
+UNSUPPORTED_ERRNOS = {
+    errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM, errno.EMLINK,
+}
+
+
+def snapshot_tree(src, dst, strategy, progress=None):
+    """
+    Recreate the tree at src as dst using a single snapshot strategy.
+
+    Returns the number of file data bytes written, which is zero for reflink
+    and hardlink snapshots. Directories are read one at a time with
+    os.scandir(), so memory use does not grow with the size of the tree.
+    """
+    os.makedirs(dst)
+    return _snapshot_dir(str(src), str(dst), SNAPSHOT_FILE_OPS[strategy], strategy == "copy", progress)
+
+
+def _snapshot_dir(src, dst, op, copies, progress):
+    bytes_written = 0
+    with os.scandir(src) as entries:
+        for entry in entries:
+            target = os.path.join(dst, entry.name)
+            if entry.is_symlink():
+                os.symlink(os.readlink(entry.path), target)
+            elif entry.is_dir():
+                os.mkdir(target)
+                bytes_written += _snapshot_dir(entry.path, target, op, copies, progress)
+            else:
+                op(entry.path, target)
+                size = os.path.getsize(target) if copies else 0
+                bytes_written += size
+                if progress:
+                    progress.add_file(size)
+    # Directory attributes last, so a read-only directory can still be filled
+    shutil.copystat(src, dst)
+    return bytes_written
+
+
+def create_snapshot(src, dst, strategies=SNAPSHOT_STRATEGIES, status_callback=None, progress=None):
+    """
+    Back up the tree at src to dst as cheaply as the filesystem allows.
+
+    Strategies are tried in order (reflink, hardlink, then a full copy);
+    when one is not supported between the two locations the partial
+    snapshot is removed and the next one is tried. Returns a tuple of the
+    strategy used and the number of file data bytes written.
+    """
+    last_error = None
+    for strategy in strategies:
+        try:
+            return strategy, snapshot_tree(src, dst, strategy, progress)
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRNOS or strategy == strategies[-1]:
+                raise
+            last_error = e
+            if status_callback:
+                status_callback(f"{strategy} backup not available ({e.strerror}), trying next method...")
+            shutil.rmtree(dst, ignore_errors=True)
+    raise last_error
+
+
+def exchange_paths(path_a, path_b):
+    """Atomically swap two paths on the same filesystem with renameat2()."""
+    libc = ctypes.CDLL(None, use_errno=True)
+    renameat2 = getattr(libc, "renameat2", None)
+    if renameat2 is None:
+        raise OSError(errno.ENOSYS, "renameat2 is not available", str(path_a))
+    result = renameat2(
+        AT_FDCWD, os.fsencode(str(path_a)), AT_FDCWD, os.fsencode(str(path_b)), RENAME_EXCHANGE
+    )
+    if result != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err), str(path_a), None, str(path_b))
+
+
+def staging_dir_for(install_path):
+    """Create a staging directory next to install_path, on the same filesystem."""
+    parent = Path(install_path).resolve().parent
+    return Path(tempfile.mkdtemp(prefix=f"{STAGING_PREFIX}{os.getpid()}_", dir=parent))
+
+
+def process_alive(pid):
+    """Return whether a process with the given pid exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sweep_staging_dirs(install_path, status_callback=None, now=None):
+    """
+    Remove staging directories left next to install_path by interrupted runs.
+
+    A staging directory is stale when the process that created it is gone,
+    or when it is older than STAGING_MAX_AGE. Only directories owned by the
+    current user are touched. Returns the removed paths.
+    """
+    parent = Path(install_path).resolve().parent
+    now = time.time() if now is None else now
+    removed = []
+    try:
+        entries = list(os.scandir(parent))
+    except OSError:
+        return removed
+    for entry in entries:
+        if not entry.name.startswith(STAGING_PREFIX):
+            continue
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+            continue
+        owner = entry.name[len(STAGING_PREFIX):].split("_", 1)[0]
+        alive = owner.isdigit() and process_alive(int(owner))
+        if alive and now - st.st_mtime < STAGING_MAX_AGE:
+            continue
+        try:
+            shutil.rmtree(entry.path)
+        except OSError as e:
+            if status_callback:
+                status_callback(f"Warning: Could not remove stale staging directory {entry.path}: {str(e)}")
+            continue
+        if status_callback:
+            status_callback(f"Removed stale staging directory {entry.path}")
+        removed.append(Path(entry.path))
+    return removed
+
+
+def swap_into_place(staged_path, install_path):
+    """
+    Make staged_path the installation at install_path.
+
+    The two directories are exchanged in one renameat2() call when the
+    kernel and filesystem support it, otherwise with two rename() calls.
+    The staged directory takes over the installation's permissions. Returns
+    the path now holding the previous installation, or None if there was
+    none.
+    """
+    install_path = Path(install_path).resolve()
+    if not install_path.exists():
+        os.rename(staged_path, install_path)
+        return None
+
+    os.chmod(staged_path, install_path.stat().st_mode & 0o7777)
+    try:
+        exchange_paths(staged_path, install_path)
+        return Path(staged_path)
+    except OSError as e:
+        if e.errno not in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+            raise
+    old_path = install_path.with_name(f".{install_path.name}_old_{os.getpid()}")
+    os.rename(install_path, old_path)
+    os.rename(staged_path, install_path)
+    return old_path
+
+
+def load_config():
+    """Return the user configuration merged over DEFAULT_CONFIG."""
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(CONFIG_FILE) as f:
+            config.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError):
+        # Unreadable config: fall back to the defaults
+        pass
+    return config
+
+
+def save_config(config):
+    """Write the user configuration."""
+    CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(CONFIG_FILE, "w") as f:
+        json.dump(config, f, indent=2)
+
+
+def update_config(**settings):
+    """
+    Change the given settings in the configuration file.
+
+    Only the settings in the file are kept alongside them, so later changes
+    to DEFAULT_CONFIG still apply. An unreadable file raises rather than
+    being overwritten.
+    """
+    try:
+        with open(CONFIG_FILE) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {}
+    config.update(settings)
+    save_config(config)
+
+
+def iter_files(root):
+    """Yield (path, lstat) for every regular file below root."""
+    for entry in scan_tree(root):
+        if entry.is_file(follow_symlinks=False):
+            yield entry.path, entry.stat(follow_symlinks=False)
+
+
+BackupInfo = namedtuple("BackupInfo", ["path", "created", "version"])
+
+
+class BackupStore:
+    """
+    The windsurf_backup_* directories kept in a home directory.
+
+    Backups made by the updater may share files through hardlinks (see
+    create_snapshot() and dedupe()), so sizes are accounted per inode:
+    a file shared by several backups is only counted once.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root else Path.home()
+
+    def backup_time(self, path):
+        """Return the creation time of a backup from its name, or its mtime."""
+        stamp = path.name[len(BACKUP_PREFIX):]
+        try:
+            # Format used by older sudo updates
+            return time.mktime(time.strptime(stamp, "%Y%m%d_%H%M%S"))
+        except ValueError:
+            pass
+        # Epoch seconds, optionally followed by "_<target>" for fleet updates
+        epoch = stamp.split("_", 1)[0]
+        if epoch.isdigit():
+            return int(epoch)
+        return path.stat().st_mtime
+
+    def backup_slug(self, path):
+        """
+        Return the installation_slug() a backup was named with, or None.
+
+        Backups made before backups were named after their installation
+        have no slug.
+        """
+        parts = path.name[len(BACKUP_PREFIX):].split("_", 1)
+        if len(parts) < 2 or parts[1].isdigit():
+            return None
+        return parts[1]
+
+    def belongs_to(self, path, install_path):
+        """
+        Return True if the backup at path may be restored to install_path.
+
+        That is, it was made from install_path or does not record an
+        installation.
+        """
+        return self.backup_slug(path) in (None, installation_slug(install_path))
+
+    def list_backups(self, install_path=None):
+        """Return backup directories, newest first, only of install_path if given."""
+        backups = [
+            p for p in self.root.glob(BACKUP_PREFIX + "*")
+            if p.is_dir() and not p.is_symlink()
+            and (install_path is None or self.belongs_to(p, install_path))
+        ]
+        return sorted(backups, key=self.backup_time, reverse=True)
+
+    def describe_backups(self, install_path=None):
+        """Return a BackupInfo for every backup (of install_path, if given), newest first."""
+        return [
+            BackupInfo(backup, self.backup_time(backup), installation_version(backup))
+            for backup in self.list_backups(install_path)
+        ]
+
+    def prune(self, keep_count=None, keep_bytes=None, status_callback=None):
+        """
+        Delete the oldest backups beyond keep_count or keep_bytes.
+
+        The limits apply to the backups of each installation separately
+        (backups without a slug count as one installation), and the newest
+        backup of each is always kept, so a backup made by the update that
+        just finished is never removed. Returns the removed paths.
+        """
+        groups = {}
+        for backup in self.list_backups():
+            groups.setdefault(self.backup_slug(backup), []).append(backup)
+        removed = []
+        for backups in groups.values():
+            removed += self._prune_group(backups, keep_count, keep_bytes, status_callback)
+        return removed
+
+    def _prune_group(self, backups, keep_count, keep_bytes, status_callback):
+        seen_inodes = set()
+        total = 0
+        removed = []
+        for index, backup in enumerate(backups):
+            if index > 0 and keep_count is not None and index >= keep_count:
+                remove = True
+            else:
+                for _, st in iter_files(backup):
+                    if (st.st_dev, st.st_ino) not in seen_inodes:
+                        seen_inodes.add((st.st_dev, st.st_ino))
+                        total += st.st_blocks * 512
+                remove = index > 0 and keep_bytes is not None and total > keep_bytes
+            if remove:
+                try:
+                    shutil.rmtree(backup)
+                    removed.append(backup)
+                    if status_callback:
+                        status_callback(f"Removed old backup {backup}")
+                except OSError as e:
+                    if status_callback:
+                        status_callback(f"Could not remove old backup {backup}: {str(e)}")
+        return removed
+
+    def dedupe(self, cache=None, status_callback=None):
+        """
+        Replace identical files across backups with hardlinks to one copy.
+
+        Files are only linked when their content hash, owner and mode match
+        and they live on the same filesystem. Returns the number of bytes
+        freed.
+        """
+        by_size = {}
+        for backup in self.list_backups():
+            for path, st in iter_files(backup):
+                if st.st_size:
+                    by_size.setdefault(st.st_size, []).append((path, st))
+
+        freed = 0
+        for size, files in by_size.items():
+            if len({(st.st_dev, st.st_ino) for _, st in files}) < 2:
+                continue
+            canonical = {}
+            for path, st in files:
+                try:
+                    digest = cache.digest(path, st) if cache else hash_file(path)
+                except OSError:
+                    continue
+                key = (digest, st.st_dev, st.st_uid, st.st_gid, st.st_mode)
+                original = canonical.setdefault(key, (path, st))
+                if original[1].st_ino == st.st_ino:
+                    continue
+                link = path + PARTIAL_SUFFIX
+                try:
+                    os.link(original[0], link)
+                    os.replace(link, path)
+                except OSError as e:
+                    if os.path.lexists(link):
+                        os.unlink(link)
+                    if status_callback:
+                        status_callback(f"Could not deduplicate {path}: {str(e)}")
+                    continue
+                if st.st_nlink == 1:
+                    freed += st.st_blocks * 512
+        return freed
+
+
+def maintain_backups(status_callback=None):
+    """
+    Apply the configured backup retention policy and deduplicate backups.
+
+    Meant to run in the background after a successful update. Returns a
+    dict with the removed backups and the bytes freed by deduplication.
+    """
+    config = load_config()
+    keep_gb = config.get("backup_keep_gb")
+    store = BackupStore()
+    removed = store.prune(
+        keep_count=config.get("backup_keep_count"),
+        keep_bytes=int(keep_gb * 1024 ** 3) if keep_gb else None,
+        status_callback=status_callback,
+    )
+    cache = open_manifest_cache(status_callback)
+    try:
+        freed = store.dedupe(cache, status_callback)
+    finally:
+        if cache:
+            cache.close()
+    return {"removed": removed, "freed_bytes": freed}
+
+
+InstallInfo = namedtuple("InstallInfo", ["path", "version", "source"])
+
+
+def candidate_install_locations():
+    """Return the directories where Windsurf is commonly installed."""
+    locations = [
+        Path.home() / "windsurf",
+        Path.home() / "Windsurf",
+        Path.home() / "Applications" / "windsurf",
+        Path.home() / "Applications" / "Windsurf",
+        Path("/opt/windsurf"),
+        Path("/opt/Windsurf"),
+        Path("/usr/local/windsurf"),
+        Path("/usr/local/Windsurf"),
+    ]
+    return locations
+
+
+def other_user_install_locations():
+    """
+    Return the per-user install locations of other users, e.g. on shared machines.
+
+    These are listed for fleet updates but never chosen as the default
+    installation (see find_windsurf_installation()).
+    """
+    own_home = Path.home().resolve()
+    locations = []
+    for home in sorted(Path("/home").glob("*")):
+        if home.resolve() == own_home:
+            continue
+        for name in ("windsurf", "Windsurf", "Applications/windsurf", "Applications/Windsurf"):
+            locations.append(home / name)
+    return locations
+
+
+def is_windsurf_installation(location):
+    """Return True if location contains a Windsurf launcher."""
+    return (location / "windsurf").exists() or (location / "windsurf.sh").exists()
+
+
+def installation_version(location):
+    """Return the Windsurf version installed at location, or None if unknown."""
+    for rel, key in VERSION_FILES:
+        try:
+            with open(Path(location) / rel) as f:
+                version = json.load(f).get(key)
+        except (OSError, ValueError, AttributeError):
+            continue
+        if version:
+            return str(version)
+    return None
+
+
+def version_file_mtime(location):
+    """Return the mtime of the first version file present at location, or None."""
+    for rel, _ in VERSION_FILES:
+        try:
+            return os.stat(Path(location) / rel).st_mtime_ns
+        except OSError:
+            continue
+    return None
+
+
+def install_root_for_executable(executable):
+    """
+    Return the installation a Windsurf executable belongs to, or None.
+
+    Symlinks such as /usr/bin/windsurf are followed. The CLI launcher lives
+    in a bin/ subdirectory of the installation, so that is tried as well.
+    """
+    try:
+        real = Path(executable).resolve()
+    except OSError:
+        return None
+    parent = real.parent
+    if parent.name == "bin" and is_windsurf_installation(parent.parent):
+        return parent.parent
+    if is_windsurf_installation(parent):
+        return parent
+    return None
+
+
+def desktop_entry_dirs():
+    """Return the directories searched for .desktop files (XDG data dirs)."""
+    data_home = os.environ.get("XDG_DATA_HOME") or str(Path.home() / ".local" / "share")
+    data_dirs = os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share"
+    return [Path(d) / "applications" for d in [data_home] + data_dirs.split(":") if d]
+
+
+def desktop_entry_executables():
+    """Yield the executables launched by Windsurf .desktop files."""
+    for directory in desktop_entry_dirs():
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if not (entry.name.endswith(".desktop") and "windsurf" in entry.name.lower()):
+                continue
+            try:
+                with open(entry.path, errors="replace") as f:
+                    lines = f.readlines()
+            except OSError:
+                continue
+            for line in lines:
+                if line.startswith("Exec="):
+                    try:
+                        command = shlex.split(line[len("Exec="):])
+                    except ValueError:
+                        break
+                    if command:
+                        yield command[0] if os.sep in command[0] else shutil.which(command[0])
+                    break
+
+
+def running_executables():
+    """Yield the executables of running Windsurf processes visible in /proc."""
+    try:
+        pids = [name for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return
+    for pid in pids:
+        try:
+            exe = os.readlink(f"/proc/{pid}/exe")
+        except OSError:
+            continue
+        if os.path.basename(exe) == "windsurf":
+            yield exe
+
+
+def discovery_watch_dirs():
+    """
+    Return the directories whose mtimes invalidate the installation index.
+
+    Installing or removing Windsurf in a common location, on PATH or via a
+    .desktop file adds or removes an entry in one of these directories.
+    """
+    locations = candidate_install_locations() + other_user_install_locations()
+    dirs = {location.parent for location in locations}
+    dirs.update(Path("/home").glob("*"))
+    dirs.update(Path(d) for d in os.environ.get("PATH", "").split(os.pathsep) if d)
+    dirs.update(desktop_entry_dirs())
+    return sorted(str(d) for d in dirs)
+
+
+def dir_mtimes(dirs):
+    """Return a mapping of each existing directory in dirs to its mtime."""
+    mtimes = {}
+    for d in dirs:
+        try:
+            mtimes[d] = os.stat(d).st_mtime_ns
+        except OSError:
+            pass
+    return mtimes
+
+
+def load_install_index():
+    """Return the persisted installation index, or None if missing or invalid."""
+    try:
+        with open(INSTALL_INDEX_FILE) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get("format") != INSTALL_INDEX_FORMAT:
+        return None
+    return index
+
+
+def save_install_index(index):
+    """Persist the installation index, ignoring errors (it is only a cache)."""
+    try:
+        INSTALL_INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+        temp = INSTALL_INDEX_FILE.with_name(INSTALL_INDEX_FILE.name + ".tmp")
+        with open(temp, "w") as f:
+            json.dump(index, f, indent=1)
+        os.replace(temp, INSTALL_INDEX_FILE)
+    except OSError:
+        pass
+
+
+def scan_installations():
+    """
+    Search the system for Windsurf installations.
+
+    Returns (path, source) tuples, most likely candidates first: the common
+    install locations, then the windsurf on PATH, then .desktop files, then
+    other users' installations (source "other-user").
+    """
+    found = []
+    for location in candidate_install_locations():
+        try:
+            if is_windsurf_installation(location):
+                found.append((str(location), "location"))
+        except PermissionError:
+            continue
+
+    executable = shutil.which("windsurf")
+    if executable:
+        root = install_root_for_executable(executable)
+        if root:
+            found.append((str(root), "path"))
+
+    for executable in desktop_entry_executables():
+        root = install_root_for_executable(executable) if executable else None
+        if root:
+            found.append((str(root), "desktop"))
+
+    for location in other_user_install_locations():
+        try:
+            if is_windsurf_installation(location):
+                found.append((str(location), "other-user"))
+        except PermissionError:
+            continue
+    return found
+
+
+def discover_installations(use_index=True):
+    """
+    Find all Windsurf installations on the system, with their versions.
+
+    The result of the last full scan is kept in INSTALL_INDEX_FILE together
+    with the mtimes of the directories it looked at. While those are
+    unchanged, the scan is skipped and the indexed installations are only
+    revalidated; versions are re-read only when the version file's mtime
+    changed. Running Windsurf processes are always checked via /proc.
+
+    Returns a list of InstallInfo, most likely candidates first, without
+    duplicates (installations reached through symlinks are listed once).
+    """
+    watch_dirs = discovery_watch_dirs()
+    mtimes = dir_mtimes(watch_dirs)
+    index = load_install_index() if use_index else None
+    known = {}
+    if index:
+        known = {entry["path"]: entry for entry in index.get("installs", [])}
+
+    if index and index.get("dirs") == mtimes:
+        candidates = [(entry["path"], entry["source"]) for entry in index.get("installs", [])]
+    else:
+        candidates = scan_installations()
+    for executable in running_executables():
+        root = install_root_for_executable(executable)
+        if root:
+            candidates.append((str(root), "process"))
+    # Other users' installations come after everything of this user's
+    candidates.sort(key=lambda candidate: candidate[1] == "other-user")
+
+    found = []
+    seen = set()
+    entries = []
+    for path, source in candidates:
+        location = Path(path)
+        try:
+            real = location.resolve()
+            if real in seen or not is_windsurf_installation(location):
+                continue
+        except OSError:
+            continue
+        seen.add(real)
+        version_mtime = version_file_mtime(location)
+        entry = known.get(path)
+        if entry and entry.get("version_mtime") == version_mtime:
+            version = entry.get("version")
+        else:
+            version = installation_version(location)
+        found.append(InstallInfo(path, version, source))
+        # Processes come and go, so their installs are found again each time
+        if source != "process":
+            entries.append({
+                "path": path, "source": source, "version": version, "version_mtime": version_mtime,
+            })
+
+    new_index = {"format": INSTALL_INDEX_FORMAT, "dirs": mtimes, "installs": entries}
+    if new_index != index:
+        save_install_index(new_index)
+    return found
+
+
+def find_windsurf_installations():
+    """
+    Find all Windsurf installations on the system.
+
+    Returns a list of paths, most likely candidates first, without
+    duplicates (installations reached through symlinks are listed once).
+    """
+    return [install.path for install in discover_installations()]
+
+
+def find_windsurf_installation():
+    """
+    Attempt to find the Windsurf installation on the system.
+    Returns the path if found, None otherwise. Other users' installations
+    are never chosen.
+    """
+    for install in discover_installations():
+        if install.source != "other-user":
+            return install.path
+    return None
+
+
+def find_source_dir(extract_dir, root):
+    """
+    Return the directory holding the extracted release.
+
+    root is the tarball's root directory prefix as returned by
+    stream_extract(); without one, the whole extraction directory is the
+    release, as in a delta update of the same tarball.
+    """
+    source_dir = Path(extract_dir) / root if root else Path(extract_dir)
+    if not source_dir.is_dir() or not any(source_dir.iterdir()):
+        raise Exception("No files found in the extracted tarball")
+    return source_dir
+
+
+def backup_installation(install_path, backup_dir, status_callback=None, progress=None):
+    """Snapshot install_path to backup_dir, replacing any previous backup there."""
+    if backup_dir.exists():
+        shutil.rmtree(backup_dir)
+    strategy, _ = create_snapshot(install_path, backup_dir, status_callback=status_callback, progress=progress)
+    if status_callback:
+        status_callback(f"Backup created at {backup_dir} ({strategy})")
+
+
+def retire_installation(old_install, backup_dir, status_callback=None, progress=None):
+    """
+    Turn a swapped-out installation into the backup at backup_dir.
+
+    The tree is renamed when backup_dir is on the same filesystem, otherwise
+    it is snapshotted there and removed. A partial snapshot is removed if
+    that fails, leaving old_install untouched.
+    """
+    if backup_dir.exists():
+        shutil.rmtree(backup_dir)
+    try:
+        os.rename(old_install, backup_dir)
+        strategy = "moved"
+    except OSError:
+        # Different filesystem: snapshot it, then drop the old tree
+        try:
+            strategy, _ = create_snapshot(old_install, backup_dir, status_callback=status_callback, progress=progress)
+        except BaseException:
+            shutil.rmtree(backup_dir, ignore_errors=True)
+            raise
+        shutil.rmtree(old_install)
+    if status_callback:
+        status_callback(f"Backup created at {backup_dir} ({strategy})")
+
+
+def retire_or_keep(old_install, install_path, backup_dir, stamp, status_callback=None, progress=None):
+    """
+    Retire a swapped-out installation to backup_dir, or keep it in sight.
+
+    For use once the new tree is live, so the update or rollback has
+    succeeded: if retire_installation() fails, that is only reported, and
+    the old tree is renamed to "<install>.previous-<stamp>" next to the
+    installation. Returns the path the old tree was left at if it could not
+    be retired, otherwise None.
+    """
+    try:
+        retire_installation(old_install, backup_dir, status_callback, progress)
+        return None
+    except Exception as e:
+        kept = Path(install_path).resolve()
+        kept = kept.with_name(f"{kept.name}.previous-{int(stamp)}")
+        try:
+            os.rename(old_install, kept)
+        except OSError:
+            kept = Path(old_install)
+        if status_callback:
+            status_callback(
+                f"Warning: Could not back up the previous installation ({str(e)}); it was left at {kept}"
+            )
+        return kept
+
+
+def extraction_dir_for(install_path):
+    """
+    Create a temporary extraction directory for a full update.
+
+    It is made next to install_path when possible, so the extracted tree is
+    on the installation's filesystem and can be renamed into place instead
+    of copied; otherwise it falls back to the system temporary directory.
+    """
+    try:
+        return staging_dir_for(install_path)
+    except OSError:
+        return Path(tempfile.mkdtemp(prefix="windsurf_update_"))
+
+
+def transfer_path(src, dst, move=False, progress=None):
+    """
+    Put the file or tree at src at dst, writing as little data as possible.
+
+    With move, src is renamed to dst when both are on the same filesystem.
+    Otherwise it is copied with copy_file(), which lets the kernel move the
+    data, and src is left in place. Returns a tuple of the method used
+    ("rename" or "copy") and the number of file data bytes written.
+    """
+    if move:
+        try:
+            os.rename(src, dst)
+            return "rename", 0
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+        return "copy", 0
+    if os.path.isdir(src):
+        return "copy", snapshot_tree(src, dst, "copy", progress)
+    copied = copy_file(src, dst)
+    if progress:
+        progress.add_file(copied)
+    return "copy", copied
+
+
+def replace_install_contents(source_dir, install_path, progress=None, move=False):
+    """
+    Replace each top-level item of install_path with the one from source_dir.
+
+    Items are moved out of source_dir when move is set and the two are on
+    the same filesystem (see transfer_path()). Returns the number of file
+    data bytes written.
+    """
+    bytes_written = 0
+    for item in source_dir.iterdir():
+        dest_path = Path(install_path) / item.name
+        try:
+            if dest_path.is_symlink() or dest_path.is_file():
+                dest_path.unlink()
+            elif dest_path.exists():
+                shutil.rmtree(dest_path)
+
+            _, copied = transfer_path(item, dest_path, move, progress)
+            bytes_written += copied
+        except PermissionError:
+            raise Exception(f"Permission denied when copying {item.name}. Try running with sudo.")
+        except Exception as e:
+            raise Exception(f"Error copying {item.name}: {str(e)}")
+    return bytes_written
+
+
+# Percentage ranges of each update phase, per mode
+UPDATE_PHASES = {
+    "full": {"extract": (2, 50), "backup": (50, 65), "install": (65, 97)},
+    "staged": {"extract": (2, 90), "backup": (90, 90), "install": (90, 97)},
+    "delta": {"extract": (2, 30), "backup": (30, 40), "install": (40, 97)},
+}
+
+
+def run_update(tarball_path, install_path, mode="full", status_callback=None,
+               progress_callback=None, start_time=None, progress_listener=None,
+               backup_root=None, normalize_permissions=False, repack=None, workers=None,
+               low_memory=None):
+    """
+    Update the Windsurf installation at install_path from a tarball.
+
+    mode is one of UPDATE_MODES. Messages are reported via status_callback.
+    Progress is tracked by a ProgressTracker: progress_callback receives the
+    overall percentage as an int and progress_listener full ProgressSnapshot
+    objects, both rate-limited to PROGRESS_MAX_HZ.
+
+    Backups go to backup_root (default: the home directory). Privileged
+    updates pass normalize_permissions to install files as 755/644 while
+    extracting. The tarball is read from the RepackCache when it has a
+    copy; otherwise repack (default: the "repack_cache" setting) adds one
+    while extracting. workers (default: the "extract_workers" setting) is
+    passed to stream_extract(). Returns a completion message; raises an
+    Exception with a user-facing message on failure. Every run is recorded
+    in the run log by a RunRecorder.
+
+    With low_memory (default: the "low_memory" setting), memory use does not
+    grow with the tarball: no TarballIndex is loaded or built, the tarball
+    is only validated (verify_tarball()) before a delta update, delta
+    updates never buffer a whole file, and files are streamed to disk on the
+    reading thread instead of being queued for writer threads. A delta
+    update still keeps a manifest of the installation.
+    """
+    with RunRecorder("update", tarball=str(tarball_path), install_path=str(install_path),
+                     mode=mode) as recorder:
+        return _run_update(
+            recorder, tarball_path, install_path, mode, status_callback, progress_callback,
+            start_time, progress_listener, backup_root, normalize_permissions, repack, workers,
+            low_memory,
+        )
+
+
+def _run_update(recorder, tarball_path, install_path, mode, status_callback, progress_callback,
+                start_time, progress_listener, backup_root, normalize_permissions, repack, workers,
+                low_memory):
+    status_callback = status_callback or (lambda message: None)
+    start_time = start_time or time.time()
+    phases = UPDATE_PHASES[mode]
+    config = load_config()
+    if low_memory is None:
+        low_memory = config.get("low_memory")
+    if low_memory:
+        workers = 1
+    elif workers is None:
+        workers = config.get("extract_workers") or EXTRACT_WORKERS
+    repack_cache = RepackCache()
+    source_path = repack_cache.lookup(tarball_path)
+    if repack is None:
+        repack = config.get("repack_cache")
+    repack = bool(repack) and source_path is None
+    source_path = source_path or tarball_path
+
+    def deliver(snapshot):
+        if progress_callback:
+            progress_callback(int(snapshot.percent))
+        if progress_listener:
+            progress_listener(snapshot)
+
+    progress = ProgressTracker(deliver, status_callback, os.path.getsize(source_path))
+    recorder.progress = progress
+    status_callback("Starting update process...")
+    if source_path != tarball_path:
+        status_callback("Reading the cached uncompressed copy of the tarball")
+    progress.start_phase("prepare", 0, 2)
+
+    temp_dir = None
+    try:
+        sweep_staging_dirs(install_path, status_callback)
+        had_install = Path(install_path).exists()
+        # The index validates every member and tells the phases how much to expect
+        index = None if low_memory else TarballIndex.load(tarball_path)
+        # The tarball's file count is the best estimate of the installation's size
+        extracted_files = index.files if index else 0
+        if mode == "delta":
+            # Nothing is extracted, but the install must not be touched before
+            # every member has been validated
+            status_callback("Verifying tarball...")
+            progress.start_phase("extract", *phases["extract"], measure="compressed")
+            try:
+                if low_memory:
+                    with repack_cache.writer(tarball_path, repack) as copy_to:
+                        extracted_files = verify_tarball(source_path, progress=progress, copy_to=copy_to)
+                elif index is None:
+                    with repack_cache.writer(tarball_path, repack) as copy_to:
+                        index = index_tarball(tarball_path, progress=progress, source_path=source_path, copy_to=copy_to)
+                    extracted_files = index.files
+            except Exception as e:
+                raise Exception(f"Failed to verify tarball: {str(e)}")
+        else:
+            if mode == "staged":
+                # Extract next to the installation so it can be renamed into place
+                try:
+                    temp_dir = staging_dir_for(install_path)
+                except PermissionError:
+                    raise Exception("Permission denied when creating the staging directory. Try running with sudo.")
+                except FileNotFoundError:
+                    raise Exception(f"The parent directory of {install_path} does not exist.")
+                except OSError as e:
+                    raise Exception(f"Failed to create the staging directory: {str(e)}")
+            else:
+                # Extract on the installation's filesystem when possible, so the
+                # new files can be renamed into place rather than copied again
+                temp_dir = extraction_dir_for(install_path)
+            status_callback(f"Created temporary directory at {temp_dir}")
+        
+            # Ensure the temporary directory has proper permissions
+            try:
+                os.chmod(temp_dir, 0o755)
+            except Exception as e:
+                status_callback(f"Warning: Could not set permissions on temp directory: {str(e)}")
+        
+            status_callback("Extracting tarball...")
+            progress.start_phase("extract", *phases["extract"], measure="compressed")
+        
+            # Extract tarball to temporary directory in a single streaming pass,
+            # indexing it on the way if this tarball has not been seen before
+            index_entries = [] if index is None and not low_memory else None
+            try:
+                with repack_cache.writer(tarball_path, repack) as copy_to:
+                    root = stream_extract(
+                        source_path, temp_dir, progress.warn, progress=progress,
+                        normalize_permissions=normalize_permissions, index_entries=index_entries,
+                        copy_to=copy_to, workers=workers,
+                    )
+            except Exception as e:
+                raise Exception(f"Failed to extract tarball: {str(e)}")
+            if index_entries is not None:
+                index = TarballIndex(index_entries)
+                index.save(tarball_path)
+            extracted_files = index.files if index else progress.files
+    
+        status_callback("Backing up current installation...")
+        progress.start_phase("backup", *phases["backup"], measure="files", total=extracted_files)
+    
+        # Check if install path exists before trying to backup
+        backup_dir = backup_dir_for(install_path, start_time, backup_root)
+        if mode == "staged":
+            # The previous installation becomes the backup after the swap
+            pass
+        elif had_install:
+            # Backup current installation to user's home directory
+            backup_installation(install_path, backup_dir, status_callback, progress)
+        else:
+            # Create the installation directory if it doesn't exist
+            try:
+                Path(install_path).mkdir(parents=True, exist_ok=True)
+                status_callback("Created new installation directory")
+            except PermissionError:
+                raise Exception("Permission denied when creating installation directory. Try running with sudo.")
+    
+        status_callback("Updating Windsurf...")
+        if mode == "delta":
+            # A second pass over the tarball, after the one verifying it
+            progress.start_phase("install", *phases["install"], measure="compressed",
+                                 total=os.path.getsize(source_path))
+        else:
+            progress.start_phase("install", *phases["install"], measure="files", total=extracted_files)
+    
+        if mode == "delta":
+            # Stream the tarball straight into the installation, only
+            # rewriting files whose contents changed
+            try:
+                stats = delta_update(
+                    source_path, install_path, progress.warn, progress=progress,
+                    normalize_permissions=normalize_permissions, index=index,
+                    buffer_limit=0 if low_memory else DELTA_BUFFER_LIMIT,
+                )
+            except PermissionError:
+                raise Exception("Permission denied when updating files. Try running with sudo.")
+            status_callback(
+                f"Updated {stats['written']} files, {stats['unchanged']} unchanged, "
+                f"{stats['removed']} removed"
+            )
+        else:
+            source_dir = find_source_dir(temp_dir, root)
+        
+            if mode == "staged":
+                # Swap the extracted tree into place, then keep the old one as the backup
+                try:
+                    old_install = swap_into_place(source_dir, install_path)
+                except PermissionError:
+                    raise Exception("Permission denied when swapping in the new installation. Try running with sudo.")
+                except OSError as e:
+                    raise Exception(f"Failed to swap in the new installation: {str(e)}")
+                if old_install and had_install:
+                    # The staging directory may now hold the previous
+                    # installation, so it must not be removed with it
+                    staging, temp_dir = temp_dir, None
+                    left = retire_or_keep(old_install, install_path, backup_dir, start_time,
+                                          status_callback, progress)
+                    if not (left and staging in left.parents):
+                        shutil.rmtree(staging, ignore_errors=True)
+                elif old_install:
+                    shutil.rmtree(old_install)
+            else:
+                # Update the installation
+                replace_install_contents(source_dir, install_path, progress, move=True)
+    
+        status_callback("Cleaning up...")
+        progress.start_phase("cleanup", 97, 100)
+    
+        # Clean up with error handling
+        if temp_dir:
+            try:
+                shutil.rmtree(temp_dir)
+            except Exception as e:
+                status_callback(f"Warning: Could not clean up temporary directory: {str(e)}")
+    
+        progress.finish()
+        status_callback(format_bytes_written(progress))
+        status_callback("Update completed successfully!")
+        return "Windsurf has been successfully updated!"
+    except BaseException:
+        # Never leave a populated extraction directory next to the installation
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    
+
+
+def restore_backup(backup_path, install_path, keep_backup=False, status_callback=None,
+                   progress_callback=None, progress_listener=None, backup_root=None,
+                   strategies=SNAPSHOT_STRATEGIES):
+    """
+    Roll the installation at install_path back to a backup.
+
+    The backup is renamed into a staging directory next to the installation
+    and swapped into place, so a rollback on one filesystem copies no data.
+    With keep_backup, or when the backup is on another filesystem, the
+    staging tree is created with create_snapshot() instead (reflinks, then
+    hardlinks, then a streaming copy, limited to strategies). The replaced
+    installation becomes a new backup in backup_root (default: the home
+    directory), so the rollback can itself be undone.
+
+    Progress is reported and the run recorded as in run_update(). Returns
+    a completion message; raises an Exception with a user-facing message on
+    failure.
+    """
+    with RunRecorder("rollback", backup=str(backup_path), install_path=str(install_path),
+                     keep_backup=keep_backup) as recorder:
+        return _restore_backup(
+            recorder, backup_path, install_path, keep_backup, status_callback, progress_callback,
+            progress_listener, backup_root, strategies,
+        )
+
+
+def _restore_backup(recorder, backup_path, install_path, keep_backup, status_callback,
+                    progress_callback, progress_listener, backup_root, strategies):
+    status_callback = status_callback or (lambda message: None)
+    backup_path = Path(backup_path)
+    if not is_windsurf_installation(backup_path):
+        raise Exception(f"{backup_path} does not contain a Windsurf installation")
+    if not BackupStore(backup_path.parent).belongs_to(backup_path, install_path):
+        raise Exception(f"{backup_path.name} is a backup of another installation, not {install_path}")
+
+    def deliver(snapshot):
+        if progress_callback:
+            progress_callback(int(snapshot.percent))
+        if progress_listener:
+            progress_listener(snapshot)
+
+    progress = ProgressTracker(deliver, status_callback, 0)
+    recorder.progress = progress
+    version = installation_version(backup_path) or "unknown version"
+    status_callback(f"Restoring {backup_path.name} ({version})...")
+    progress.start_phase("prepare", 0, 2)
+    sweep_staging_dirs(install_path, status_callback)
+    try:
+        staging = staging_dir_for(install_path)
+    except PermissionError:
+        raise Exception("Permission denied when creating the staging directory. Try running with sudo.")
+
+    staged = staging / "windsurf"
+    method = None
+    try:
+        if not keep_backup:
+            try:
+                os.rename(backup_path, staged)
+                method = "moved"
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        if method is None:
+            total = sum(1 for entry in scan_tree(backup_path) if not entry.is_dir(follow_symlinks=False))
+            progress.start_phase("restore", 2, 90, measure="files", total=total)
+            method, _ = create_snapshot(
+                backup_path, staged, strategies, status_callback=status_callback, progress=progress
+            )
+        progress.start_phase("install", 90, 97)
+        old_install = swap_into_place(staged, install_path)
+    except BaseException as e:
+        # Put a moved backup back where it was; a partial snapshot can go
+        if method == "moved" and staged.exists():
+            os.rename(staged, backup_path)
+        shutil.rmtree(staging, ignore_errors=True)
+        if isinstance(e, PermissionError):
+            raise Exception("Permission denied when restoring the backup. Try running with sudo.")
+        raise
+
+    try:
+        if old_install:
+            # Never replace an existing backup, e.g. one kept with keep_backup
+            stamp = int(time.time())
+            new_backup = backup_dir_for(install_path, stamp, backup_root)
+            while os.path.lexists(new_backup):
+                stamp += 1
+                new_backup = backup_dir_for(install_path, stamp, backup_root)
+            retire_or_keep(old_install, install_path, new_backup, stamp, status_callback, progress)
+    finally:
+        try:
+            # Only once empty: it may still hold the previous installation
+            os.rmdir(staging)
+        except OSError:
+            pass
+
+    progress.start_phase("cleanup", 97, 100)
+    progress.finish()
+    status_callback("Rollback completed successfully!")
+    return f"Windsurf has been rolled back to {backup_path.name} ({version}, {method})."
+
+
+def installation_slug(install_path):
+    """Return the name under which backups of an installation are kept."""
+    return str(Path(install_path).resolve()).strip("/").replace("/", "-")
+
+
+def unique_targets(targets):
+    """Return targets without the ones resolving to an earlier target's path."""
+    seen = set()
+    unique = []
+    for target in targets:
+        resolved = Path(target).resolve()
+        if resolved not in seen:
+            seen.add(resolved)
+            unique.append(target)
+    return unique
+
+
+def backup_dir_for(install_path, start_time, backup_root=None):
+    """
+    Return the directory for a backup of install_path made at start_time.
+
+    Backups are named after their installation, so rollbacks and retention
+    can tell the backups of different installations apart.
+    """
+    name = f"{BACKUP_PREFIX}{int(start_time)}_{installation_slug(install_path)}"
+    return Path(backup_root or Path.home()) / name
+
+
+def fleet_update(tarball_path, targets, jobs=4, status_callback=None, repack=None, workers=None,
+                 low_memory=None, progress_listener=None):
+    """
+    Update several installations from one tarball.
+
+    The tarball is decompressed and extracted once into a shared staging
+    directory, then applied to each target by a pool of jobs workers. Each
+    target is backed up first as in a full update. status_callback receives
+    (target, message) and may be called from several threads. The
+    RepackCache, the extraction workers and low_memory are set up as in
+    run_update(). Targets resolving to the same directory are only updated
+    once (see unique_targets()).
+
+    The shared extraction and each target have their own ProgressTracker;
+    progress_listener receives (target, ProgressSnapshot), with a target of
+    None for the extraction, and may also be called from several threads.
+    Every target is recorded in the run log by its own RunRecorder.
+
+    Returns a dict mapping each target to a (success, message) tuple.
+    """
+    import concurrent.futures
+
+    status_callback = status_callback or (lambda target, message: None)
+    progress_listener = progress_listener or (lambda target, snapshot: None)
+    start_time = time.time()
+    targets = unique_targets(targets)
+    results = {}
+
+    staging = Path(tempfile.mkdtemp(prefix="windsurf_update_"))
+    try:
+        status_callback(None, f"Extracting tarball to {staging}...")
+        config = load_config()
+        if low_memory is None:
+            low_memory = config.get("low_memory")
+        if low_memory:
+            workers = 1
+        elif workers is None:
+            workers = config.get("extract_workers") or EXTRACT_WORKERS
+        repack_cache = RepackCache()
+        source_path = repack_cache.lookup(tarball_path)
+        if repack is None:
+            repack = config.get("repack_cache")
+        extract_status = functools.partial(status_callback, None)
+        extraction = ProgressTracker(
+            functools.partial(progress_listener, None), extract_status,
+            os.path.getsize(source_path or tarball_path),
+        )
+        extraction.start_phase("extract", 0, 100, measure="compressed")
+        with repack_cache.writer(tarball_path, bool(repack) and source_path is None) as copy_to:
+            root = stream_extract(
+                source_path or tarball_path, staging, extract_status, progress=extraction,
+                copy_to=copy_to, workers=workers,
+            )
+        extraction.finish()
+        source_dir = find_source_dir(staging, root)
+
+        def apply(target):
+            report = functools.partial(status_callback, target)
+            with RunRecorder("update", tarball=str(tarball_path), install_path=str(target),
+                             mode="full", fleet=len(targets)) as recorder:
+                progress = ProgressTracker(functools.partial(progress_listener, target), report)
+                recorder.progress = progress
+                # The extraction is shared, so each target only backs up and installs
+                progress.start_phase("backup", 0, 50, measure="files", total=extraction.files)
+                if Path(target).exists():
+                    report("Backing up current installation...")
+                    backup_installation(target, backup_dir_for(target, start_time), report, progress)
+                else:
+                    Path(target).mkdir(parents=True)
+                report("Updating Windsurf...")
+                progress.start_phase("install", 50, 97, measure="files", total=extraction.files)
+                replace_install_contents(source_dir, target, progress)
+                progress.finish()
+                report("Update completed successfully!")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = {pool.submit(apply, target): target for target in targets}
+            for future in concurrent.futures.as_completed(futures):
+                target = futures[future]
+                try:
+                    future.result()
+                    results[target] = (True, "Windsurf has been successfully updated!")
+                except Exception as e:
+                    status_callback(target, f"Error: {str(e)}")
+                    results[target] = (False, f"Update failed: {str(e)}")
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    return results
@@ -0,0 +1,565 @@
+"""
+Windsurf Updater - Qt user interface.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from PyQt6.QtWidgets import (
+    QApplication, QMainWindow, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
+    QWidget, QFileDialog, QMessageBox, QProgressBar, QLineEdit, QComboBox, QInputDialog
+)
+from PyQt6.QtCore import Qt, QMimeData, QThread, QTimer, pyqtSignal
+from PyQt6.QtGui import QDragEnterEvent, QDropEvent, QFont
+
+from windsurf_engine import (
+    TARBALL_SUFFIXES, UPDATE_MODES, VERSION, BackupStore, find_windsurf_installation,
+    format_progress, is_supported_tarball, load_config, maintain_backups, restore_backup,
+    run_update, update_config,
+)
+
+
+def helper_command():
+    """Return the command that starts the privileged update helper."""
+    if getattr(sys, "frozen", False):
+        # PyInstaller bundle: the executable is the entry point itself
+        return [sys.executable, "--privileged-helper"]
+    entry_point = Path(__file__).resolve().with_name("windsurf_updater.py")
+    return [sys.executable, str(entry_point), "--privileged-helper"]
+
+
+class UpdaterThread(QThread):
+    """Thread for handling the update process without blocking the UI."""
+    progress_signal = pyqtSignal(int)
+    progress_detail_signal = pyqtSignal(str)
+    status_signal = pyqtSignal(str)
+    finished_signal = pyqtSignal(bool, str)
+
+    def __init__(self, tarball_path, install_path, mode="full"):
+        super().__init__()
+        self.tarball_path = tarball_path
+        self.install_path = install_path
+        self.mode = mode
+        self.start_time = time.time()
+
+    def run(self):
+        try:
+            message = run_update(
+                self.tarball_path,
+                self.install_path,
+                self.mode,
+                status_callback=self.status_signal.emit,
+                progress_callback=self.progress_signal.emit,
+                progress_listener=self.report_progress,
+                start_time=self.start_time,
+            )
+            self.finished_signal.emit(True, message)
+        except Exception as e:
+            self.status_signal.emit(f"Error: {str(e)}")
+            self.finished_signal.emit(False, f"Update failed: {str(e)}")
+
+    def report_progress(self, snapshot):
+        """Forward a (rate-limited) progress snapshot to the UI."""
+        self.progress_detail_signal.emit(format_progress(snapshot))
+
+
+class RollbackThread(UpdaterThread):
+    """Thread that restores a backup without blocking the UI."""
+
+    def __init__(self, backup_path, install_path):
+        super().__init__(None, install_path)
+        self.backup_path = backup_path
+
+    def run(self):
+        try:
+            message = restore_backup(
+                self.backup_path,
+                self.install_path,
+                status_callback=self.status_signal.emit,
+                progress_callback=self.progress_signal.emit,
+                progress_listener=self.report_progress,
+            )
+            self.finished_signal.emit(True, message)
+        except Exception as e:
+            self.status_signal.emit(f"Error: {str(e)}")
+            self.finished_signal.emit(False, f"Rollback failed: {str(e)}")
+
+
+class PrivilegedUpdaterThread(UpdaterThread):
+    """Thread that runs the update helper through pkexec and relays its progress."""
+
+    def helper_args(self):
+        """Return the helper arguments describing what to do."""
+        return [
+            "--tarball", str(self.tarball_path),
+            "--install-path", str(self.install_path),
+            "--mode", self.mode,
+            "--backup-root", str(Path.home()),
+            "--start-time", str(self.start_time),
+        ]
+
+    def run(self):
+        command = ["pkexec"] + helper_command() + self.helper_args()
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        except OSError as e:
+            self.finished_signal.emit(False, f"Failed to run with sudo: {str(e)}")
+            return
+
+        # Read stderr alongside stdout, so a helper (or pkexec) writing a lot
+        # to it cannot fill the pipe and stall before it reports
+        stderr_chunks = []
+        drainer = threading.Thread(target=lambda: stderr_chunks.extend(process.stderr), daemon=True)
+        drainer.start()
+
+        result = None
+        for line in process.stdout:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                self.status_signal.emit(line.strip())
+                continue
+            if event["event"] == "status":
+                self.status_signal.emit(event["message"])
+            elif event["event"] == "progress":
+                self.progress_signal.emit(int(event["percent"]))
+                self.progress_detail_signal.emit(event["detail"])
+            elif event["event"] == "done":
+                result = (event["success"], event["message"])
+        process.wait()
+        drainer.join()
+        stderr = "".join(stderr_chunks)
+
+        if result is None:
+            # pkexec was dismissed, or the helper died before reporting
+            result = (False, f"Failed with sudo:\n\n{stderr}")
+        self.finished_signal.emit(*result)
+
+
+class PrivilegedRollbackThread(PrivilegedUpdaterThread):
+    """Thread that restores a backup through the pkexec helper."""
+
+    def __init__(self, backup_path, install_path):
+        super().__init__(None, install_path)
+        self.backup_path = backup_path
+
+    def helper_args(self):
+        return [
+            "--rollback", str(self.backup_path),
+            "--install-path", str(self.install_path),
+            "--backup-root", str(Path.home()),
+        ]
+
+
+class BackupMaintenanceThread(QThread):
+    """Thread that prunes and deduplicates backups after an update."""
+    status_signal = pyqtSignal(str)
+
+    def run(self):
+        try:
+            result = maintain_backups()
+            if result["removed"] or result["freed_bytes"]:
+                self.status_signal.emit(
+                    f"Backups: removed {len(result['removed'])} old, "
+                    f"freed {result['freed_bytes'] / 1024 ** 2:.0f} MB by deduplication"
+                )
+        except Exception as e:
+            self.status_signal.emit(f"Warning: Backup maintenance failed: {str(e)}")
+
+
+class DiscoveryThread(QThread):
+    """Thread that looks for the Windsurf installation while the window opens."""
+    found_signal = pyqtSignal(str)
+
+    def run(self):
+        try:
+            path = find_windsurf_installation()
+        except Exception:
+            path = None
+        self.found_signal.emit(path or "")
+
+
+class WindsurfUpdaterWindow(QMainWindow):
+    """Main window for the Windsurf Updater application."""
+    
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle(f"Windsurf Updater v{VERSION}")
+        self.setMinimumSize(600, 400)
+        
+        self.tarball_path = None
+        self.windsurf_path = None
+        self.maintenance_thread = None
+        self.maintenance_pending = False
+        
+        self.init_ui()
+        
+        # Find the installation in the background so the window shows at once
+        self.path_edit.setPlaceholderText("Looking for a Windsurf installation...")
+        self.discovery_thread = DiscoveryThread()
+        self.discovery_thread.found_signal.connect(self.installation_found)
+        self.discovery_thread.start()
+        
+        # Show the disclaimer over the window until it has been accepted once
+        if not load_config().get("disclaimer_accepted"):
+            QTimer.singleShot(0, self.show_disclaimer)
+    
+    def show_disclaimer(self):
+        """Show the disclaimer dialog and remember when it is accepted."""
+        disclaimer_text = (
+            "<h3>⚠️ DISCLAIMER</h3>"
+            "<p><b>This is NOT an official Windsurf utility.</b></p>"
+            "<p>This tool is provided as-is, with no warranties or guarantees of any kind.</p>"
+            "<p>Use at your own risk. No liability is accepted for any damage to your system "
+            "resulting from the use of this tool.</p>"
+            "<p>Always back up your important data before performing system updates.</p>"
+            "<p>This is a temporary solution until Windsurf develops an official update mechanism.</p>"
+        )
+        
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("Disclaimer")
+        msg_box.setTextFormat(Qt.TextFormat.RichText)
+        msg_box.setText(disclaimer_text)
+        msg_box.setIcon(QMessageBox.Icon.Warning)
+        msg_box.setStandardButtons(QMessageBox.StandardButton.Ok)
+        msg_box.accepted.connect(self.remember_disclaimer)
+        msg_box.open()
+    
+    def remember_disclaimer(self):
+        """Record that the disclaimer was accepted so it is not shown again."""
+        try:
+            update_config(disclaimer_accepted=True)
+        except (OSError, ValueError) as e:
+            self.update_status(f"Warning: Could not save settings: {str(e)}")
+    
+    def init_ui(self):
+        """Initialize the user interface."""
+        main_widget = QWidget()
+        main_layout = QVBoxLayout(main_widget)
+        
+        # Title
+        title_label = QLabel(f"Windsurf Updater v{VERSION}")
+        title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        title_font = QFont()
+        title_font.setPointSize(16)
+        title_font.setBold(True)
+        title_label.setFont(title_font)
+        main_layout.addWidget(title_label)
+        
+        # Disclaimer
+        disclaimer_label = QLabel(
+            "⚠️ DISCLAIMER: This is NOT an official Windsurf utility. Use at your own risk. ⚠️"
+        )
+        disclaimer_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        disclaimer_font = QFont()
+        disclaimer_font.setItalic(True)
+        disclaimer_label.setFont(disclaimer_font)
+        disclaimer_label.setStyleSheet("color: #FF5733;")
+        main_layout.addWidget(disclaimer_label)
+        
+        # Description
+        desc_label = QLabel(
+            "Drag and drop the Windsurf tarball below to update your installation."
+        )
+        desc_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        main_layout.addWidget(desc_label)
+        
+        # Drop area
+        self.drop_area = QLabel("Drop Windsurf tarball here")
+        self.drop_area.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.drop_area.setMinimumHeight(150)
+        self.drop_area.setStyleSheet(
+            "border: 2px dashed #aaa; border-radius: 5px; padding: 10px;"
+        )
+        self.drop_area.setAcceptDrops(True)
+        self.drop_area.dragEnterEvent = self.dragEnterEvent
+        self.drop_area.dropEvent = self.dropEvent
+        main_layout.addWidget(self.drop_area)
+        
+        # Browse button
+        browse_button = QPushButton("Browse for tarball")
+        browse_button.clicked.connect(self.browse_tarball)
+        main_layout.addWidget(browse_button)
+        
+        # Windsurf installation path
+        path_layout = QHBoxLayout()
+        path_layout.addWidget(QLabel("Windsurf Installation Path:"))
+        
+        self.path_edit = QLineEdit()
+        self.path_edit.setPlaceholderText("Path to Windsurf installation")
+        path_layout.addWidget(self.path_edit)
+        
+        path_browse_button = QPushButton("Browse")
+        path_browse_button.clicked.connect(self.browse_install_path)
+        path_layout.addWidget(path_browse_button)
+        
+        main_layout.addLayout(path_layout)
+        
+        # Update mode
+        mode_layout = QHBoxLayout()
+        mode_layout.addWidget(QLabel("Update mode:"))
+        
+        self.mode_combo = QComboBox()
+        for mode, label in UPDATE_MODES.items():
+            self.mode_combo.addItem(label, mode)
+        mode_layout.addWidget(self.mode_combo)
+        
+        main_layout.addLayout(mode_layout)
+        
+        # Progress bar
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(False)
+        main_layout.addWidget(self.progress_bar)
+        
+        # Status label
+        self.status_label = QLabel("")
+        self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        main_layout.addWidget(self.status_label)
+        
+        # Update button
+        self.update_button = QPushButton("Update Windsurf")
+        self.update_button.clicked.connect(self.start_update)
+        self.update_button.setEnabled(False)
+        main_layout.addWidget(self.update_button)
+        
+        # Rollback button
+        self.rollback_button = QPushButton("Roll Back to a Backup...")
+        self.rollback_button.clicked.connect(self.start_rollback)
+        main_layout.addWidget(self.rollback_button)
+        
+        self.setCentralWidget(main_widget)
+    
+    def dragEnterEvent(self, event: QDragEnterEvent):
+        """Handle drag enter events for the drop area."""
+        if event.mimeData().hasUrls() and len(event.mimeData().urls()) == 1:
+            url = event.mimeData().urls()[0]
+            if url.isLocalFile() and is_supported_tarball(url.toLocalFile()):
+                event.acceptProposedAction()
+    
+    def dropEvent(self, event: QDropEvent):
+        """Handle drop events for the drop area."""
+        urls = event.mimeData().urls()
+        if urls and len(urls) == 1:
+            self.tarball_path = urls[0].toLocalFile()
+            self.drop_area.setText(f"Selected: {os.path.basename(self.tarball_path)}")
+            self.update_button.setEnabled(bool(self.windsurf_path))
+            self.status_label.setText("Ready to update. Click 'Update Windsurf' to proceed.")
+    
+    def browse_tarball(self):
+        """Open file dialog to select a tarball."""
+        patterns = " ".join(f"*{suffix}" for suffix in TARBALL_SUFFIXES)
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Select Windsurf Tarball", "", f"Tarball Files ({patterns});;All Files (*)"
+        )
+        if file_path:
+            self.tarball_path = file_path
+            self.drop_area.setText(f"Selected: {os.path.basename(self.tarball_path)}")
+            self.update_button.setEnabled(bool(self.windsurf_path))
+            self.status_label.setText("Ready to update. Click 'Update Windsurf' to proceed.")
+    
+    def browse_install_path(self):
+        """Open directory dialog to select Windsurf installation path."""
+        dir_path = QFileDialog.getExistingDirectory(
+            self, "Select Windsurf Installation Directory", ""
+        )
+        if dir_path:
+            self.windsurf_path = dir_path
+            self.path_edit.setText(dir_path)
+            self.update_button.setEnabled(bool(self.tarball_path))
+    
+    def installation_found(self, path):
+        """Fill in the installation found in the background, unless one was entered."""
+        self.path_edit.setPlaceholderText("Path to Windsurf installation")
+        if path and not self.path_edit.text().strip():
+            self.windsurf_path = path
+            self.path_edit.setText(path)
+            self.update_button.setEnabled(bool(self.tarball_path))
+    
+    def closeEvent(self, event):
+        """Let the installation search and backup maintenance finish before the window goes away."""
+        self.discovery_thread.wait()
+        if self.maintenance_thread:
+            # Destroying a running QThread aborts in the middle of dedupe()
+            self.maintenance_pending = False
+            self.status_label.setText("Finishing backup maintenance...")
+            self.maintenance_thread.wait()
+        super().closeEvent(event)
+    
+    def start_update(self):
+        """Start the update process."""
+        if not self.tarball_path:
+            QMessageBox.warning(self, "Error", "Please select a Windsurf tarball first.")
+            return
+        
+        # Get the installation path from the text field (in case user modified it)
+        self.windsurf_path = self.path_edit.text().strip()
+        
+        if not self.windsurf_path:
+            QMessageBox.warning(self, "Error", "Please specify the Windsurf installation path.")
+            return
+        
+        # Check if the installation path exists
+        if not os.path.isdir(self.windsurf_path):
+            result = QMessageBox.question(
+                self,
+                "Directory Not Found",
+                f"The directory '{self.windsurf_path}' does not exist. Do you want to create it?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if result == QMessageBox.StandardButton.Yes:
+                try:
+                    os.makedirs(self.windsurf_path, exist_ok=True)
+                except Exception as e:
+                    QMessageBox.critical(self, "Error", f"Failed to create directory: {str(e)}")
+                    return
+            else:
+                return
+        
+        # Check if we have write permissions to the installation path
+        if not os.access(self.windsurf_path, os.W_OK):
+            result = QMessageBox.question(
+                self,
+                "Insufficient Permissions",
+                "You don't have write permissions to the Windsurf installation directory. "
+                "Do you want to run the update with sudo?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if result == QMessageBox.StandardButton.Yes:
+                # Run the update with sudo
+                self.run_with_sudo()
+            return
+        
+        # Start the update thread
+        self.start_update_thread(UpdaterThread(
+            self.tarball_path, self.windsurf_path, self.mode_combo.currentData()
+        ))
+    
+    def start_rollback(self):
+        """Let the user pick a backup of the installation and restore it."""
+        self.windsurf_path = self.path_edit.text().strip()
+        if not self.windsurf_path:
+            QMessageBox.warning(self, "Error", "Please specify the Windsurf installation path.")
+            return
+        
+        backups = BackupStore().describe_backups(self.windsurf_path)
+        if not backups:
+            QMessageBox.information(
+                self, "Roll Back", f"No backups of {self.windsurf_path} were found in your home directory."
+            )
+            return
+        
+        items = [
+            f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(backup.created))}  -  "
+            f"{backup.version or 'unknown version'}  -  {backup.path.name}"
+            for backup in backups
+        ]
+        item, ok = QInputDialog.getItem(
+            self, "Roll Back", f"Restore which backup to {self.windsurf_path}?", items, 0, False
+        )
+        if not ok:
+            return
+        backup_path = backups[items.index(item)].path
+        
+        # The backup is staged next to the installation, so its parent must be writable too
+        install_parent = Path(self.windsurf_path).resolve().parent
+        if not (os.access(self.windsurf_path, os.W_OK) and os.access(install_parent, os.W_OK)):
+            result = QMessageBox.question(
+                self,
+                "Insufficient Permissions",
+                "You don't have write permissions to the Windsurf installation directory. "
+                "Do you want to run the rollback with sudo?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if result == QMessageBox.StandardButton.Yes:
+                self.start_update_thread(
+                    PrivilegedRollbackThread(backup_path, self.windsurf_path), "Rollback"
+                )
+            return
+        
+        self.start_update_thread(RollbackThread(backup_path, self.windsurf_path), "Rollback")
+    
+    def start_update_thread(self, thread, operation="Update"):
+        """Show progress for and start an update or rollback thread."""
+        self.progress_bar.setVisible(True)
+        self.update_button.setEnabled(False)
+        self.rollback_button.setEnabled(False)
+        self.status_label.setText(
+            "Rolling back Windsurf..." if operation == "Rollback" else "Updating Windsurf..."
+        )
+        
+        self.operation = operation
+        self.update_thread = thread
+        self.update_thread.progress_signal.connect(self.update_progress)
+        self.update_thread.progress_detail_signal.connect(self.update_progress_detail)
+        self.update_thread.status_signal.connect(self.update_status)
+        self.update_thread.finished_signal.connect(self.update_finished)
+        self.update_thread.start()
+    
+    def run_with_sudo(self):
+        """Run the update through the privileged helper."""
+        QMessageBox.information(
+            self,
+            "Sudo Update",
+            "A sudo prompt will appear. Please enter your password to continue with the update.\n\n"
+            "Progress will be shown here while the update runs."
+        )
+        self.start_update_thread(PrivilegedUpdaterThread(
+            self.tarball_path, self.windsurf_path, self.mode_combo.currentData()
+        ))
+    
+    def update_progress(self, value):
+        """Update the progress bar."""
+        self.progress_bar.setValue(value)
+    
+    def update_progress_detail(self, detail):
+        """Show bytes, file counts and ETA on the progress bar."""
+        self.progress_bar.setFormat(f"%p% - {detail}")
+    
+    def update_status(self, message):
+        """Update the status label."""
+        self.status_label.setText(message)
+    
+    def update_finished(self, success, message):
+        """Handle update completion."""
+        self.progress_bar.setVisible(False)
+        self.update_button.setEnabled(True)
+        self.rollback_button.setEnabled(True)
+        
+        if success:
+            self.start_backup_maintenance()
+            QMessageBox.information(self, f"{self.operation} Complete", message)
+        else:
+            QMessageBox.critical(self, f"{self.operation} Failed", message)
+    
+    def start_backup_maintenance(self):
+        """Prune and deduplicate backups in the background, once at a time."""
+        if self.maintenance_thread and self.maintenance_thread.isRunning():
+            # Run again when the current pass is done, for the newest backup
+            self.maintenance_pending = True
+            return
+        self.maintenance_pending = False
+        self.maintenance_thread = BackupMaintenanceThread()
+        self.maintenance_thread.status_signal.connect(self.update_status)
+        self.maintenance_thread.finished.connect(self.backup_maintenance_finished)
+        self.maintenance_thread.start()
+    
+    def backup_maintenance_finished(self):
+        """Start the pass requested while the previous one was running."""
+        if self.maintenance_pending:
+            # finished is emitted just before the thread stops
+            self.maintenance_thread.wait()
+            self.start_backup_maintenance()
+
+
+def run_gui(argv):
+    """Start the Qt application and return its exit code."""
+    app = QApplication(argv)
+    window = WindsurfUpdaterWindow()
+    window.show()
+    return app.exec()
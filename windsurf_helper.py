@@ -0,0 +1,83 @@
+"""
+Windsurf Updater - privileged update helper.
+
+The GUI starts this through pkexec when the installation is not writable by
+the current user. It runs the same engine as an unprivileged update (or
+rollback, with --rollback) and reports back on stdout, one JSON object per
+line:
+
+    {"event": "status", "message": "..."}
+    {"event": "progress", "percent": 42.5, "detail": "..."}
+    {"event": "done", "success": true, "message": "..."}
+
+Like the engine, this module must not import PyQt6.
+"""
+
+import argparse
+import json
+import sys
+
+from windsurf_engine import UPDATE_MODES, format_progress, restore_backup, run_update
+
+
+def parse_args(argv):
+    """Parse the helper's command line arguments."""
+    parser = argparse.ArgumentParser(prog="windsurf-updater --privileged-helper")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--tarball")
+    action.add_argument("--rollback", metavar="BACKUP")
+    parser.add_argument("--install-path", required=True)
+    parser.add_argument("--mode", default="full", choices=list(UPDATE_MODES))
+    parser.add_argument(
+        "--backup-root",
+        help="directory to store the backup in (the invoking user's home, "
+             "since pkexec resets HOME)",
+    )
+    parser.add_argument("--start-time", type=float)
+    return parser.parse_args(argv)
+
+
+def main(argv=None, out=None):
+    """Run a privileged update and return the process exit code."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    out = out or sys.stdout
+
+    # Status and progress are only reported from the thread running the
+    # update (see ProgressTracker), so events never interleave
+    def emit(event, **fields):
+        out.write(json.dumps({"event": event, **fields}) + "\n")
+        out.flush()
+
+    def report_progress(snapshot):
+        emit("progress", percent=round(snapshot.percent, 1), detail=format_progress(snapshot))
+
+    try:
+        if args.rollback:
+            message = restore_backup(
+                args.rollback,
+                args.install_path,
+                status_callback=lambda message: emit("status", message=message),
+                progress_listener=report_progress,
+                backup_root=args.backup_root,
+            )
+        else:
+            message = run_update(
+                args.tarball,
+                args.install_path,
+                args.mode,
+                status_callback=lambda message: emit("status", message=message),
+                progress_listener=report_progress,
+                start_time=args.start_time,
+                backup_root=args.backup_root,
+                normalize_permissions=True,
+            )
+    except Exception as e:
+        action = "Rollback" if args.rollback else "Update"
+        emit("done", success=False, message=f"{action} failed: {str(e)}")
+        return 1
+    emit("done", success=True, message=message)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())